@@ -1,47 +1,196 @@
 import sys
 import time
-import re
+import functools
+import inspect
+import threading
+import weakref
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
 
     from selenium import webdriver
     from selenium.webdriver.common.keys import Keys
     from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.expected_conditions import presence_of_element_located
+    from selenium.webdriver.support.expected_conditions import (
+        presence_of_element_located, staleness_of, visibility_of_element_located
+    )
     from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.common.exceptions import NoSuchElementException
+    from selenium.common.exceptions import TimeoutException
 except ImportError:
     sys.exit("[1] Make sure to install Selenium for your Python version.")
 
+try:
+    import lxml.html
+    from requests import RequestException
+except ImportError:
+    sys.exit("[1] Make sure to install requests and lxml for your Python version.")
+
+import forum
+import parsers
+from cache import ProfileCache
+from instrumentation import InstrumentedDriver, shared_stats
+from outbox import PMFloodError, PMQueue, PMSendError
+from records import Profile
+from storage import MemberDirectory, PMStore, UidIndex
+from transport import HTTPTransport
+from watch import Watcher
+from watchlist import Watchlist
 
 class API(object):
     """
     Provides an interface to the https://www.v3rmillion.net/ website.
     """
 
-    driver = "PhantomJS"
-    url = "https://v3rmillion.net/index.php"
-    alerts_url = "https://v3rmillion.net/alerts.php"
-    pm_url = "https://v3rmillion.net/private.php"
-    pm_send_url = "https://v3rmillion.net/private.php?action=send"
-    usersearch_url = "https://v3rmillion.net/memberlist.php?sort=username&order=ascending&perpage=500&username=%s&page=%d"
-    profile_url = "https://v3rmillion.net/member.php?action=profile&uid=%s"
+    driver_name = "PhantomJS"
+    interactive_driver_name = "Chrome"
+    site = forum.site
+    url = forum.url
+    alerts_url = forum.alerts_url
+    alerts_page_url = forum.alerts_page_url
+    pm_url = forum.pm_url
+    pm_send_url = forum.pm_send_url
+    pm_folder_url = forum.pm_folder_url
+    pm_read_url = forum.pm_read_url
+    usersearch_url = forum.usersearch_url
+    profile_url = forum.profile_url
+
+    uid_from_url = parsers.uid_from_url
+
+    max_alert_listing = forum.max_alert_listing
+    max_workers = 8  # concurrent profile loads across every API instance
+    memberlist_page_size = forum.memberlist_page_size
+
+    # used by browser_profile="fast"
+    blocked_hosts = (
+        "*.doubleclick.net", "*.googlesyndication.com", "*.googleadservices.com", "*.google-analytics.com",
+        "*.googletagmanager.com", "*.adnxs.com", "*.amazon-adsystem.com", "fonts.googleapis.com",
+        "fonts.gstatic.com"
+    )
+    fast_window_size = (800, 600)
+
+    # run in PhantomJS's page by browser_profile="fast", aborts requests for
+    # fonts and for the hosts (patterns) passed as arguments[0]
+    phantom_blocker = """
+        var blocked = arguments[0];
+        this.onResourceRequested = function(request, network) {
+            var host = (request.url.split("/")[2] || "").split(":")[0];
+            if (/\\.(woff2?|ttf|otf|eot)(\\?|#|$)/i.test(request.url)) {
+                network.abort();
+                return;
+            }
+            for (var i = 0; i < blocked.length; i++) {
+                var pattern = blocked[i];
+                if (pattern.indexOf("*.") === 0) {
+                    var suffix = pattern.slice(1);
+                    if (host === pattern.slice(2) || host.slice(-suffix.length) === suffix) {
+                        network.abort();
+                        return;
+                    }
+                } else if (host === pattern) {
+                    network.abort();
+                    return;
+                }
+            }
+        };
+    """
+
+    counts_max_age = 30  # seconds the header counters of a loaded page are trusted for
+
+    _workers = threading.BoundedSemaphore(max_workers)
+
+    stats = shared_stats  # shared by every instance unless one is given its own
+
+    site_urls = forum.site_urls
+
+    def __init__(self, login=None, timeout=6, interactive=False, transport="selenium", base_url=None,
+                 profile_cache=True, uid_index=None, member_directory=None, driver=None,
+                 session_store=None, pm_store=None, stats=None, browser_profile="default"):
+        """
+        driver names the selenium webdriver to use (PhantomJS, or Chrome in
+        interactive mode, by default), it's only started on first use.
+        browser_profile="fast" starts PhantomJS or Chrome without images,
+        fonts and ad or tracker hosts (blocked_hosts) and in a small window,
+        Chrome also uses the eager page load strategy (PhantomJS ignores it).
 
-    uid_from_url = re.compile(r".+\?.+uid=(\d+)")
+        transport="http" serves the read-only calls from a keep-alive HTTP
+        session (sharing the webdriver's cookies after login) instead of
+        the webdriver, base_url points every request at another host such
+        as a local server serving saved pages.
 
-    max_alert_listing = 10
+        profile_cache is True for a default ProfileCache, a ProfileCache
+        instance or None/False to always load profiles from the site.
 
-    try:
-        driver = getattr(webdriver, driver)()
-    except Exception:  # selenium throws Exception for some reason
-        sys.exit("[1] Make sure you have the %r webdriver" % driver)
+        uid_index is the path of (or a UidIndex for) a persistent
+        username -> UID index consulted before any memberlist search.
 
-    def __init__(self, login=None, timeout=6, interactive=False):
+        member_directory is the path of (or a MemberDirectory for) the
+        store iter_members() crawls into.
+
+        session_store is a SessionStore the login cookies are saved to,
+        a saved session that's still valid is reused instead of logging in.
+
+        pm_store is the path of (or a PMStore for) the local copy of the
+        PM folders kept by pm_sync(), pm_read() is answered from it.
+
+        stats is the instrumentation.Stats page loads, element lookups and
+        timings are recorded in, API.stats (process wide) by default.
+        """
         self.iprint("Initializer loaded.", interactive)
         self.timeout = timeout
+        if stats is not None:
+            self.stats = stats
         self.interactive = interactive
         self._login = False
-        self._webdriver_closed = False
+        self._driver = None
+        self._cookies = None
+        self.session_store = session_store
+
+        # navigation state, see _navigated()
+        self.location = None
+        self._loaded_at = None
+        self._counts = None
+
+        if driver is None:
+            driver = self.interactive_driver_name if interactive else self.driver_name
+        self.driver_name = driver
+
+        if browser_profile not in ("default", "fast"):
+            raise ValueError("Unknown browser profile %r, use \"default\" or \"fast\"" % browser_profile)
+        self.browser_profile = browser_profile
+
+        if profile_cache is True:
+            profile_cache = ProfileCache()
+        elif profile_cache is False:
+            profile_cache = None
+        self.profile_cache = profile_cache
+
+        if isinstance(uid_index, str):
+            uid_index = UidIndex(uid_index)
+        self.uid_index = uid_index
+
+        if isinstance(member_directory, str):
+            member_directory = MemberDirectory(member_directory)
+        self.member_directory = member_directory
+
+        if isinstance(pm_store, str):
+            pm_store = PMStore(pm_store)
+        self.pm_store = pm_store
+
+        if base_url is not None:
+            for name in self.site_urls:
+                setattr(self, name, forum.site_url(name, base_url))
+
+        if transport == "http":
+            self.http = HTTPTransport(timeout, on_get=self.stats.navigation)
+        elif transport == "selenium":
+            self.http = None
+        else:
+            raise ValueError("Unknown transport %r, use \"selenium\" or \"http\"" % transport)
+
+        # idle logged in transports of profile_read_many(), kept for their connections
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
 
         if login is None:
             return
@@ -49,19 +198,108 @@ class API(object):
         self.username = login[0]
         # we want to discard the password as soon as possible so we don't store it.
 
-        if interactive:
-            self.driver.close()
-            try:
-                self.driver = webdriver.Chrome()
-            except Exception:
-                sys.exit("[1] No Chrome driver found for interactive mode.")
-
         if login[1:]:
+            if self._restore_session(login[0]):
+                self.iprint("Restored saved session.")
+                return
             self.iprint("Logging in.")
             self.login(login[0], login[1])
         else:
             raise IndexError("Pass a full login tuple in the form (\"username\", \"password\")")
     
+    @property
+    def driver(self):
+        """
+        The selenium webdriver, started the first time it's needed so
+        that constructing an API doesn't launch a browser.
+        """
+        if self._driver is None:
+            self.iprint("Starting the %s webdriver." % self.driver_name)
+            try:
+                self._driver = InstrumentedDriver(self._start_driver(), self.stats)
+            except Exception:  # selenium throws Exception for some reason
+                sys.exit("[1] Make sure you have the %r webdriver" % self.driver_name)
+
+            if self._cookies:
+                # cookies can only be set for the domain that's loaded
+                self._driver.get(self.url)
+                for cookie in self._cookies:
+                    self._driver.add_cookie(cookie)
+        return self._driver
+
+    def _start_driver(self):
+        """
+        Launch the webdriver for self.browser_profile, the "fast" profile
+        is only tuned for PhantomJS and Chrome, other webdrivers just get
+        the smaller window.
+        """
+        factory = getattr(webdriver, self.driver_name)
+        if self.browser_profile != "fast":
+            return factory()
+
+        if self.driver_name == "PhantomJS":
+            capabilities = dict(webdriver.DesiredCapabilities.PHANTOMJS)
+            capabilities["phantomjs.page.settings.loadImages"] = False
+            driver = factory(desired_capabilities=capabilities, service_args=["--load-images=no", "--disk-cache=true"])
+            # GhostDriver runs scripts in PhantomJS's own context (where the page's
+            # request hooks are) through this command, selenium doesn't map it
+            driver.command_executor._commands["executePhantomScript"] = ("POST", "/session/$sessionId/phantom/execute")
+            driver.execute("executePhantomScript", {"script": self.phantom_blocker, "args": [list(self.blocked_hosts)]})
+        elif self.driver_name == "Chrome":
+            options = webdriver.ChromeOptions()
+            options.add_argument("--blink-settings=imagesEnabled=false")
+            options.add_argument("--disable-remote-fonts")
+            options.add_argument("--disable-extensions")
+            options.add_argument("--host-resolver-rules=%s" % ", ".join(
+                "MAP %s ~NOTFOUND" % host for host in self.blocked_hosts
+            ))
+            options.add_experimental_option("prefs", {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.managed_default_content_settings.plugins": 2,
+                "profile.managed_default_content_settings.popups": 2,
+                "profile.managed_default_content_settings.notifications": 2,
+            })
+            capabilities = options.to_capabilities()
+            capabilities["pageLoadStrategy"] = "eager"
+            driver = factory(desired_capabilities=capabilities)
+        else:
+            driver = factory()
+
+        driver.set_window_size(*self.fast_window_size)
+        return driver
+
+    def _restore_session(self, username):
+        """
+        Log in with the cookies saved in the session store, they're
+        checked with a single HTTP request for the index page and left
+        alone if the site no longer accepts them or can't be reached.
+        """
+        if self.session_store is None:
+            return False
+
+        cookies = self.session_store.load(username)
+        if not cookies:
+            return False
+
+        session = self.http if self.http is not None else HTTPTransport(self.timeout, on_get=self.stats.navigation)
+        session.load_cookies(cookies)
+        try:
+            logged_in = parsers.is_logged_in(session.get(self.url))
+        except RequestException:
+            # the site couldn't be reached, leave it to login()
+            return False
+        finally:
+            if session is not self.http:
+                session.close()
+
+        if not logged_in:
+            self.session_store.discard(username)
+            return False
+
+        self._cookies = cookies
+        self._login = True
+        return True
+
     def iprint(self, msg, interactive=None, use_input=False):
         if interactive is None:
             interactive = self.interactive
@@ -74,12 +312,49 @@ class API(object):
     def requires_login(func):
         """
         A decorator which is used to declare functions that can only be called
-        when the user is logged in.
+        when the user is logged in, each call is also recorded in self.stats
+        (generators are timed while they're being consumed).
         """
+        def instrumented(stats, frame, generator):
+            error = None
+            try:
+                while True:
+                    stats.resume(frame)
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        stats.suspend(frame)
+                    yield item
+            except Exception as exc:
+                error = exc
+                raise
+            finally:
+                generator.close()
+                stats.end(frame, error)
+
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
             if not args[0]._login:
                 raise PermissionError("Login first using the API.login(...) method")
-            return func(*args, **kwargs)
+
+            stats = args[0].stats
+            frame = stats.begin(func.__name__)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as exc:
+                stats.end(frame, exc)
+                raise
+
+            if inspect.isgenerator(result):
+                stats.suspend(frame)
+                generator = instrumented(stats, frame, result)
+                # one that's never iterated doesn't run its finally, record it once it's dropped
+                weakref.finalize(generator, stats.end, frame)
+                return generator
+            stats.end(frame)
+            return result
         return wrapper
 
     def _recaptcha_login(self, username, password):
@@ -99,11 +374,11 @@ class API(object):
 
         for div, anchor in zip(divs, anchors):
             if anchor.get_attribute("href") == "member.php?action=lostpw":
-                self.driver.close()
+                self.quit()
                 raise LookupError("Invalid credentials.")
             elif div.get_attribute("class") == "error":
                 if not self.interactive:
-                    self.driver.close()
+                    self.quit()
                     raise LookupError("reCAPTCHA required to be solved due to too many incorrect logins")
                 else:
                     self.iprint("reCAPTCHA found, solve it please.", use_input=True)
@@ -143,64 +418,62 @@ class API(object):
             if anchor.get_attribute("href") == "member.php?action=lostpw":
                 # is there an <a> tag which guides us where to recover our passwords?
                 
-                self.driver.close()
+                self.quit()
                 raise LookupError("Invalid credentials.")
             elif div.get_attribute("class") == "error":
                 # reCAPTCHA notice found?
 
                 if not self.interactive:
-                    self.driver.close()
+                    self.quit()
                     raise LookupError("reCAPTCHA required to be solved due to too many incorrect logins")
                 else:
                     self.iprint("reCAPTCHA found, solve it please.", use_input=True)
                     self._recaptcha_login(username, password)
         self._login = True
+        self._cookies = self.driver.get_cookies()
+        self._navigated(self.driver.current_url, parsers.parse_document(self.driver.page_source))
+
+        if self.http is not None:
+            self.http.load_cookies(self._cookies)
+        if self.session_store is not None:
+            self.session_store.save(username, self._cookies)
     
+    def _header_counts(self, max_age=None):
+        """
+        The alert and PM counters of the most recently loaded page, the
+        index is only loaded when that page is older than max_age
+        (self.counts_max_age by default) seconds.
+        """
+        if max_age is None:
+            max_age = self.counts_max_age
+        if self._counts is None or time.monotonic() - self._loaded_at >= max_age:
+            self._page(self.url)
+            if self._counts is None:
+                raise PermissionError("The site didn't serve a logged in page, the session may have expired.")
+        return dict(self._counts)
+
     @requires_login
     def alert_count_read(self):
         """
         Get the amount of alerts the user has
         """
-        self.driver.refresh()
-        try:
-            alerts = int(self.driver.find_element_by_xpath("//span[contains(@class, 'alert_count alert_new')]").text)
-        except (IndexError, NoSuchElementException):
-            return 0
-        return alerts
+        return self._header_counts()["alerts"]
 
     @requires_login
     def pm_count_read(self):
         """
         Get the PM count of the user
         """
-        self.driver.refresh()
-        try:
-            pms = int(self.driver.find_element_by_xpath("//span[contains(@class, 'pm_count pm_new')]").text)
-        except (IndexError, NoSuchElementException):
-            return 0
-        return pms
+        return self._header_counts()["pms"]
     
     @requires_login
-    def pm_alert_count_read(self):
+    def pm_alert_count_read(self, max_age=None):
         """
         Retrieve the PM and alert count of the user, to be used when
-        the API user doesn't want to refresh twice in order to obtain
-        the alert count and PM count as it is slower.
+        the API user wants both counts at once, they're read from the
+        same page either way. max_age=0 forces a fresh page.
         """
-        self.driver.refresh()
-        try:
-            alerts = int(self.driver.find_element_by_xpath("//span[contains(@class, 'alert_count alert_new')]").text)
-        except (IndexError, NoSuchElementException):
-            alerts = 0
-        try:
-            pms = int(self.driver.find_element_by_xpath("//span[contains(@class, 'pm_count pm_new')]").text)
-        except (IndexError, NoSuchElementException):
-            pms = 0
-        
-        return {
-            "alerts": alerts,
-            "pms": pms
-        }
+        return self._header_counts(max_age)
 
     @requires_login
     def latest_n_alerts_read(self, n):
@@ -212,59 +485,126 @@ class API(object):
         if n > self.max_alert_listing:
             raise IndexError("Can't retrieve more than %d alerts." % self.max_alert_listing)
 
-        self.driver.get(self.alerts_url)
+        for alert in parsers.parse_alerts(self._page(self.alerts_url, wait_for="latestAlertsListing"))[:n]:
+            yield alert._asdict()
 
-        WebDriverWait(self.driver, self.timeout).until(presence_of_element_located((By.ID, 'latestAlertsListing')))
+    @requires_login
+    def iter_alerts(self, since=None, max_pages=None):
+        """
+        Stream the whole alert history, newest first, as parsers.Alert
+        records. Pages of alerts.php are only loaded as the generator is
+        consumed, and with since (the id of the last alert processed)
+        it stops at the first alert that isn't newer than it.
+        """
+        page = 1
+        while max_pages is None or page <= max_pages:
+            tree = self._page(self.alerts_page_url % page, wait_for="latestAlertsListing")
+            for alert in parsers.parse_alerts(tree):
+                if since is not None and alert.id is not None and alert.id <= since:
+                    return
+                yield alert
 
-        alerts_table = self.driver.find_element_by_xpath("//tbody[contains(@id, 'latestAlertsListing')]")
-        alert_rows = alerts_table.find_elements_by_xpath("//tr[contains(@class, 'alert-row')]")
+            if not parsers.has_next_page(tree):
+                return
+            page += 1
 
-        for alert in alert_rows[:n]:
-            try:
-                user_data, alert_data, date = alert.find_elements_by_xpath(".//td[contains(@class, 'trow')]")
-            except ValueError:
-                yield alert.get_attribute("innerHTML")
-            yield {
-                "avatar_link": user_data.find_element_by_class_name("avatar").find_elements_by_xpath(".//img")[0].get_attribute("src"),
-                "username": alert_data.find_element_by_xpath(".//a/span[@style]").text,
-                "action": alert_data.find_element_by_xpath(".//a").text,
-                "time": date.text,
-            }
+    @requires_login
+    def pm_list_read(self):
+        """
+        List the PMs on the first page of the inbox as dicts with
+        their pmid, title, sender, date and link.
+        """
+        return [pm._asdict() for pm in parsers.parse_pm_listing(self._page(self.pm_url))]
 
-        self.driver.get(self.url)  # restore position
+    @requires_login
+    def pm_sync(self, messages=True, fids=None):
+        """
+        Copy every PM folder (or the ones in fids) into self.pm_store,
+        only the PMs newer than the last sync are fetched (each folder is
+        walked newest first and left at the first PM already stored).
+        With messages=True the body of every new PM is loaded too, which
+        marks it as read on the site. Returns the number of PMs added.
+        """
+        if self.pm_store is None:
+            raise ValueError("Pass a pm_store to the API to sync PMs into")
+
+        first = self._page(self.pm_url)
+        folders = parsers.parse_pm_folders(first) or [(forum.inbox_fid, "Inbox")]
+        first_fid = folders[0][0]
+        added = 0
+
+        for fid, name in folders:
+            if fids is not None and fid not in fids:
+                continue
+            last = self.pm_store.last_pmid(fid)
+            new = []
+            page = 1
+            while True:
+                if fid == first_fid and page == 1:
+                    tree = first
+                else:
+                    tree = self._page(self.pm_folder_url % (fid, page))
+
+                pms = parsers.parse_pm_listing(tree)
+                unseen = [pm for pm in pms if pm.pmid is not None and pm.pmid > last]
+                new.extend(unseen)
+
+                if len(unseen) < len(pms) or not pms or not parsers.has_next_page(tree):
+                    break
+                page += 1
+
+            now = datetime.now()
+            self.pm_store.add(fid, name, (
+                (
+                    pm,
+                    parsers.parse_date(pm.date, now) if pm.date else None,
+                    parsers.parse_pm_message(self._page(pm.link)) if messages else None
+                )
+                for pm in new
+            ))
+            added += len(new)
+
+        return added
 
     @requires_login
     def pm_read(self, username, title, silent=False):
         """
         Read a PM by a certain person and with a certain title,
         the silent parameter returns False instead of raising any
-        exceptions.
+        exceptions. With a pm_store the inbox listing is synced (which
+        stops at the newest PM already stored) and the PM looked up
+        locally, only its own body is loaded (and stored) if the store
+        doesn't have it yet.
         """
-        self.driver.get(self.pm_url)
-        pms = self.driver.find_elements_by_xpath("/html/body/div[3]/div/div[2]/form/table/tbody/tr/td[2]/table/tbody/tr")[2:-1]
+        if self.pm_store is not None:
+            self.pm_sync(messages=False, fids=(forum.inbox_fid,))
+            found = self.pm_store.find(username, title, fid=forum.inbox_fid, limit=1)
+
+            if found:
+                message = found[0]["message"]
+                if message is None:
+                    message = parsers.parse_pm_message(self._page(self.pm_read_url % found[0]["pmid"]))
+                    self.pm_store.set_message(found[0]["pmid"], message)
+                return message
 
-        if not pms:
             if not silent:
-                raise LookupError("No PMs found in PM directory")
+                raise LookupError("No PMs found that match the parameters")
             return False
-        
-        _ = 0
-        for pm in pms:
-            pm_title, pm_sender = pm.find_elements_by_xpath(".//td")[2:4]
 
-            if pm_title.text == title and pm_sender.text == username:
-                _ += 1
-                break
-        
-        if not _:
+        pms = parsers.parse_pm_listing(self._page(self.pm_url))
+
+        if not pms:
             if not silent:
-                raise LookupError("No PMs found that match the parameters")
+                raise LookupError("No PMs found in PM directory")
             return False
 
-        pm.find_element_by_xpath(".//a[@href]").click()
-        message = self.driver.find_element_by_xpath("//*[@id='pid_']").text
-        self.driver.get(self.url)
-        return message
+        for pm in pms:
+            if pm.title == title and pm.sender == username:
+                return parsers.parse_pm_message(self._page(pm.link))
+
+        if not silent:
+            raise LookupError("No PMs found that match the parameters")
+        return False
 
     @requires_login
     def pm_send(self, username, title, content):
@@ -280,9 +620,15 @@ class API(object):
             raise ValueError("The title and content must be at least 1 character.")
 
         self.driver.get(self.pm_send_url)
+        wait = WebDriverWait(self.driver, self.timeout)
+
         username_input = self.driver.find_element_by_id("s2id_autogen1")
         username_input.send_keys(username)
-        time.sleep(2)
+        try:
+            # the recipient has to be picked from the autocomplete once it offers it
+            wait.until(visibility_of_element_located((By.CSS_SELECTOR, ".select2-result-selectable")))
+        except TimeoutException:
+            raise PMSendError("No member named %r was offered as a recipient." % username)
         username_input.send_keys(Keys.ENTER)
 
         title_input = self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/form/table/tbody/tr/td[2]/table/tbody/tr[4]/td[2]/input")
@@ -292,19 +638,81 @@ class API(object):
         content_input.click()
         content_input.send_keys(content)
 
-        self.driver.find_element_by_xpath('//*[@id="content"]/form/table/tbody/tr/td[2]/div/input[1]').click()
-        time.sleep(1)
+        submit = self.driver.find_element_by_xpath('//*[@id="content"]/form/table/tbody/tr/td[2]/div/input[1]')
+        submit.click()
+        wait.until(staleness_of(submit))
 
-        general_error = self.driver.find_elements_by_xpath("/html/body/div[3]/div/div[2]/form/table/tbody/tr/td[2]/div[1]")
-        recently_pmed_error = self.driver.find_elements_by_xpath("//*[@id=\"content\"]/table/tbody/tr[2]/td") 
+        tree = parsers.parse_document(self.driver.page_source, self.driver.current_url)
+        self._navigated(self.driver.current_url, tree)
 
-        if general_error:
-            if general_error[0].text:
-                raise Exception(general_error[0].text)
-        elif recently_pmed_error:
-            raise Exception(recently_pmed_error[0].text)
-        
-        self.driver.get(self.url)
+        general_error = parsers.first_text(tree, parsers.pm_send_error)
+        recently_pmed_error = parsers.first_text(tree, parsers.pm_flood_error)
+
+        if general_error is not None:
+            if general_error:
+                raise PMSendError(general_error)
+        elif recently_pmed_error is not None:
+            raise PMFloodError(recently_pmed_error, parsers.parse_retry_after(recently_pmed_error))
+
+    def pm_queue(self, **kwargs):
+        """
+        Return a PMQueue sending through this API, see outbox.PMQueue.
+        """
+        return PMQueue(self, **kwargs)
+
+    @requires_login
+    def pm_send_many(self, messages, **kwargs):
+        """
+        Send an iterable of (username, title, content) PMs paced around
+        the site's flood control, yielding an OutgoingPM for each one as
+        it's sent or fails for good (its status and error say which).
+        """
+        queue = self.pm_queue(**kwargs)
+        for username, title, content in messages:
+            queue.put(username, title, content)
+        yield from queue.drain()
+
+    def watch(self, on_alert=None, on_pm=None, **kwargs):
+        """
+        Return a Watcher delivering new alerts and PMs of this account to
+        the callbacks (or through async iteration), see watch.Watcher.
+        """
+        return Watcher(self, on_alert, on_pm, **kwargs)
+
+    def watchlist(self, uids=(), on_change=None, **kwargs):
+        """
+        Return a Watchlist keeping the profiles of uids fresh and passing
+        their changes to on_change, see watchlist.Watchlist.
+        """
+        return Watchlist(self, uids, on_change, **kwargs)
+
+    def _navigated(self, url, tree=None):
+        """
+        Record the page that was just loaded, its header counters are
+        kept so the count readers don't have to load anything while
+        they're fresh (only if it's a logged in page which has them).
+        """
+        self.location = url
+        self._loaded_at = time.monotonic()
+        self._counts = parsers.parse_counts(tree) if tree is not None else None
+
+    def _page(self, url, wait_for=None):
+        """
+        Load a page through the active transport and return it parsed,
+        with the webdriver that's a single page_source round trip
+        rather than one per element looked up. wait_for is the id of an
+        element the webdriver should wait for before reading the page.
+        """
+        if self.http is not None:
+            tree = self.http.get(url)
+        else:
+            self.driver.get(url)
+            if wait_for is not None:
+                WebDriverWait(self.driver, self.timeout).until(presence_of_element_located((By.ID, wait_for)))
+            tree = parsers.parse_document(self.driver.page_source, self.driver.current_url)
+
+        self._navigated(url, tree)
+        return tree
 
     def _get_profile(self, username=None, uid=None, page_depth=10):
         """
@@ -317,148 +725,151 @@ class API(object):
         if username is None and uid is None:
             raise Exception("Either provide a username or a UID")
 
-        if uid is not None:
-            self.driver.get(self.profile_url % uid)
-
-            error = self.driver.find_elements_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr[2]/td")
-
-            if error and "The member you specified is either invalid or doesn't exist." in error[0].text:
-                raise LookupError("Couldn't find user by UID.")
-            thread_count = self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[5]/td[2]").text
-            thread_count = thread_count.split('(')[0]
-
-            post_count = self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[4]/td[2]").text
-            post_count = post_count.split('(')[0]
-
-            data = {
-                "username": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/fieldset/table/tbody/tr/td[1]/span[1]/strong/span/strong").text,
-                "status": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/fieldset/table/tbody/tr/td[1]/span[2]/span").text,
-                "last_visit": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[3]/td[2]").text,
-                "joined": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[2]/td[2]").text,
-                "time_spent_online": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[6]/td[2]").text,
-                "signature": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[3]/table[1]/tbody/tr[2]/td").text,
-                "members_referred": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[7]/td[2]").text,
-                "thread_count": int(thread_count),
-                "post_count": int(post_count),
-                "reputation": int(self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[8]/td[2]/strong").text)
-            }
+        if uid is None and self.uid_index is not None:
+            uid = self.uid_index.get(username)
 
-            self.driver.get(self.url)
+        if uid is None:
+            # the memberlist rows carry the profile link so we never have to click
+            for page in range(1, page_depth+1):
+                users = parsers.parse_usersearch(self._page(self.usersearch_url % (username, page)))
+                if self.uid_index is not None:
+                    self.uid_index.add_many(users)
 
-            return data
+                uid = parsers.match_uid(users, username)
+                if uid is not None or not users:
+                    break
+            if uid is None:
+                raise LookupError("Couldn't find user by username.")
 
-        found = False
-        
-        for page in range(1, page_depth+1):
-            if found:
-                break
+        data = parsers.parse_profile(self._page(self.profile_url % uid))
+        data["uid"] = str(uid)
 
-            self.driver.get(self.usersearch_url % (username, page))           
-            error = self.driver.find_elements_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr[3]/td")
+        if self.uid_index is not None:
+            self.uid_index.add(data["username"], data["uid"])
 
-            if error and "There were no members found with the search criteria you entered." in error[0].text:
-                raise LookupError("Couldn't find user by username.")
+        return data
 
-            for user in self.driver.find_elements_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr"):
-                name = user.find_element_by_xpath(".//a")
-                if name.text == username:
-                    name.click()
-                    found = True
-                    break
+    def _cached_profile(self, username=None, uid=None, *fields):
+        """
+        _get_profile() behind the profile cache, the profile is only
+        loaded when one of the requested fields (all of them if none
+        are given) is missing or past its time to live.
+        """
+        if self.profile_cache is None:
+            return self._get_profile(username, uid)
 
-        thread_count = self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[5]/td[2]").text
-        thread_count = thread_count.split('(')[0]
+        if uid is None and username is not None:
+            uid = self.profile_cache.uid_for(username)
 
-        post_count = self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[4]/td[2]").text
-        post_count = post_count.split('(')[0]
+        if uid is not None:
+            data = self.profile_cache.get(uid, fields)
+            if data is not None:
+                return data
 
-        status = self.driver.find_elements_by_xpath("/html/body/div[3]/div/div[2]/fieldset/table/tbody/tr/td[1]/span[2]/a[1]/span")
+        data = self._get_profile(username, uid)
+        self.profile_cache.put(data)
+        return data
 
-        if status:
-            status = "Online"
-        else:
-            status = "Offline"
-
-        data = {
-            "username": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/fieldset/table/tbody/tr/td[1]/span[1]/strong/span/strong").text,
-            "status": status,
-            "last_visit": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[3]/td[2]").text,
-            "joined": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[2]/td[2]").text,
-            "time_spent_online": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[6]/td[2]").text,
-            "signature": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[3]/table[1]/tbody/tr[2]/td").text,
-            "members_referred": self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[7]/td[2]").text,
-            "thread_count": int(thread_count),
-            "post_count": int(post_count),
-            "reputation": int(self.driver.find_element_by_xpath("/html/body/div[3]/div/div[2]/table/tbody/tr/td[1]/table[1]/tbody/tr[8]/td[2]/strong").text),
-            "uid": self.uid_from_url.match(self.driver.current_url).groups()[0]
-        }
+    @requires_login
+    def iter_members(self, username="", restart=False, max_pages=None):
+        """
+        Crawl the memberlist (every member, or the ones matching username)
+        and yield a parsers.Member per row as each page comes in. Pages
+        are stored in self.member_directory with a checkpoint, so a crawl
+        that's interrupted picks up from the next page when called again
+        unless restart=True.
+        """
+        directory = self.member_directory
+        page = 0
 
-        self.driver.get(self.url)
+        if directory is not None:
+            if restart:
+                directory.reset(username)
+            page = directory.checkpoint(username)
 
-        return data
+        while max_pages is None or max_pages > 0:
+            page += 1
+            try:
+                members = parsers.parse_memberlist(self._page(self.usersearch_url % (username, page)))
+            except LookupError:
+                members = []
+
+            if directory is not None:
+                directory.add_members(members, username, page)
+            if self.uid_index is not None and self.uid_index is not directory:
+                self.uid_index.add_many((member.username, member.uid) for member in members)
+
+            yield from members
+
+            if len(members) < self.memberlist_page_size:
+                if directory is not None:
+                    directory.reset(username)
+                return
+            if max_pages is not None:
+                max_pages -= 1
 
     @requires_login
     def reputation_read(self, username=None, uid=None):
         """
         Read the reputation of a user.
         """
-        return self._get_profile(username, uid)['reputation']           
+        return self._cached_profile(username, uid, "reputation")["reputation"]
 
     @requires_login
     def post_count_read(self, username=None, uid=None):
         """
         Read the post count of a user.
         """
-        return self._get_profile(username, uid)['post_count']
+        return self._cached_profile(username, uid, "post_count")["post_count"]
 
     @requires_login
     def thread_count_read(self, username=None, uid=None):
         """
         Read the thread count of a user.
         """
-        return self._get_profile(username, uid)['thread_count']
+        return self._cached_profile(username, uid, "thread_count")["thread_count"]
 
     @requires_login
     def referral_count_read(self, username=None, uid=None):
         """
         Read the member referral count of a user.
         """
-        return self._get_profile(username, uid)['members_referred']
+        return self._cached_profile(username, uid, "members_referred")["members_referred"]
 
     @requires_login
     def signature_read(self, username=None, uid=None):
         """
         Read the signature of a user.
         """
-        return self._get_profile(username, uid)['signature']
+        return self._cached_profile(username, uid, "signature")["signature"]
 
     @requires_login
     def time_spent_online_read(self, username=None, uid=None):
         """
         Read the amount of time a user has spent online.
         """
-        return self._get_profile(username, uid)['time_spent_online']
+        return self._cached_profile(username, uid, "time_spent_online")["time_spent_online"]
 
     @requires_login
     def join_date_read(self, username=None, uid=None):
         """
         Read the join date of a user.
         """
-        return self._get_profile(username, uid)['joined']
+        return self._cached_profile(username, uid, "joined")["joined"]
 
     @requires_login
     def last_visit_read(self, username=None, uid=None):
         """
         Read the time that a user has last visited the website.
         """
-        return self._get_profile(username, uid)['last_visit']
+        return self._cached_profile(username, uid, "last_visit")["last_visit"]
 
     @requires_login
     def status_read(self, username=None, uid=None):
         """
         Read whether the user is online/offline.
         """
-        return self._get_profile(username, uid)['status']
+        return self._cached_profile(username, uid, "status")["status"]
 
     @requires_login
     def username_to_uid(self, username):
@@ -466,30 +877,145 @@ class API(object):
         Convert a username to a UID which can help in caching
         and making lookups faster.
         """
-        return self._get_profile(username)['uid']
+        if self.profile_cache is not None:
+            uid = self.profile_cache.uid_for(username)
+            if uid is not None:
+                return uid
+        if self.uid_index is not None:
+            uid = self.uid_index.get(username)
+            if uid is not None:
+                return uid
+        return self._cached_profile(username)["uid"]
 
     @requires_login
     def profile_read(self, username=None, uid=None):
         """
         Return all the properties of a user's profile.
         """
-        return self._get_profile(username, uid)
+        return self._cached_profile(username, uid)
+
+    @requires_login
+    def profile_record_read(self, username=None, uid=None):
+        """
+        profile_read() as a records.Profile, with the dates, time spent
+        online and counters already parsed.
+        """
+        return Profile.from_dict(self._cached_profile(username, uid))
+
+    def _session_cookies(self):
+        """
+        The cookies for new HTTP transports, read in the calling thread
+        since the webdriver can't be used from several threads at once.
+        """
+        if self.http is not None:
+            return None
+        return self._driver.get_cookies() if self._driver is not None else self._cookies
+
+    def _session(self, cookies=None):
+        """
+        A logged in HTTP transport from the pool, or a new one with this
+        API's cookies. Hand it back with _release_session().
+        """
+        with self._sessions_lock:
+            if self._sessions:
+                return self._sessions.pop()
+
+        if self.http is not None:
+            return self.http.clone()
+
+        session = HTTPTransport(self.timeout, on_get=self.stats.navigation)
+        session.load_cookies(cookies)
+        return session
+
+    def _release_session(self, session):
+        with self._sessions_lock:
+            self._sessions.append(session)
+
+    def _load_profile(self, cookies, frames, uid):
+        """
+        Load one profile for profile_read_many() through a pooled session,
+        the page load is counted towards the caller's frames.
+        """
+        session = self._session(cookies)
+        try:
+            with self._workers, self.stats.working_for(frames):
+                data = parsers.parse_profile(session.get(self.profile_url % uid))
+        finally:
+            self._release_session(session)
+        data["uid"] = str(uid)
+
+        if self.profile_cache is not None:
+            self.profile_cache.put(data)
+        if self.uid_index is not None:
+            self.uid_index.add(data["username"], data["uid"])
+        return data
+
+    @requires_login
+    def profile_read_many(self, uids, workers=4):
+        """
+        Load many profiles concurrently, each worker uses its own logged
+        in HTTP session (kept for the next batch until quit()) and the
+        number of loads in flight across every API instance is capped by
+        API.max_workers. Yields (uid, profile, error) tuples as they
+        complete, a failed profile has error set to the exception instead
+        of aborting the batch.
+        """
+        pending = []
+
+        for uid in uids:
+            data = self.profile_cache.get(uid) if self.profile_cache is not None else None
+            if data is not None:
+                yield str(uid), data, None
+            else:
+                pending.append(uid)
+
+        if not pending:
+            return
+        cookies = self._session_cookies()
+        frames = self.stats.frames()
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {executor.submit(self._load_profile, cookies, frames, uid): uid for uid in pending}
+            for future in as_completed(futures):
+                try:
+                    yield str(futures[future]), future.result(), None
+                except Exception as exc:
+                    yield str(futures[future]), None, exc
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def quit(self):
+        """
+        Quit the webdriver if it was started and release the HTTP
+        session, the API has to be logged in again to be used after.
+        """
+        self._login = False
+        self._cookies = None
+
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+        if self.http is not None:
+            self.http.close()
+
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
 
     def close(self):
         """
-        Alias method for self.__del__(), doesn't need to be
+        Alias method for self.quit(), doesn't need to be
         called but it's nicer if it is.
         """
-        self.__del__()
+        self.quit()
 
     def __del__(self):
         """
         Overriden destructor which quits the webdriver if it
-        is still running, and sets self._webdriver_closed to
-        False so that if the user has already closed it the
-        garbage collector won't try to free a released
-        reference.
-        """
-        if not self._webdriver_closed:
-            self.driver.close()
-            self._webdriver_closed = True
+        was ever started.
+        """
+        if getattr(self, "_driver", None) is not None:
+            self.quit()
@@ -0,0 +1,243 @@
+"""
+asyncio facade of the API for bots that want hundreds of lookups in
+flight on one event loop instead of a thread (or browser) per request.
+"""
+import asyncio
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:
+    aiohttp = None
+
+import forum
+import parsers
+from cache import ProfileCache
+from instrumentation import shared_stats
+from outbox import PMFloodError, PMSendError
+
+
+class AsyncAPI(object):
+    """
+    Mirrors the public surface of API (login, profile_read,
+    username_to_uid, the count readers, latest_n_alerts_read and pm_send)
+    as coroutines over a pooled aiohttp session. limit_per_host caps the
+    requests in flight to the site, the rest wait for a connection.
+
+    There's no browser behind it, so a login that runs into the
+    reCAPTCHA fails, log in with API and hand its session over with
+    AsyncAPI.from_api() instead.
+    """
+
+    limit_per_host = 8
+
+    def __init__(self, base_url=None, timeout=6, limit_per_host=None, cookies=None, profile_cache=True):
+        if aiohttp is None:
+            raise ImportError("[1] Make sure to install aiohttp to use the AsyncAPI.")
+
+        for name in forum.site_urls:
+            setattr(self, name, forum.site_url(name, base_url))
+
+        if limit_per_host is not None:
+            self.limit_per_host = limit_per_host
+        if profile_cache is True:
+            profile_cache = ProfileCache()
+        elif profile_cache is False:
+            profile_cache = None
+
+        self.timeout = timeout
+        self.profile_cache = profile_cache
+        self.stats = shared_stats
+        self._cookies = cookies
+        self._session = None
+        self._login = bool(cookies)
+
+    @classmethod
+    def from_api(cls, api, **kwargs):
+        """
+        An AsyncAPI sharing the login session of a logged in API.
+        """
+        if not api._login:
+            raise PermissionError("Login first using the API.login(...) method")
+
+        cookies = api._driver.get_cookies() if api._driver is not None else api._cookies
+        base_url = None
+        if api.url != forum.url:
+            parts = urlsplit(api.url)
+            base_url = "%s://%s" % (parts.scheme, parts.netloc)
+        return cls(base_url=base_url, timeout=api.timeout, cookies=cookies, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _http(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=self.limit_per_host),
+                cookie_jar=aiohttp.CookieJar(unsafe=True),  # let a local stand-in server keep cookies
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": forum.user_agent},
+            )
+            for cookie in self._cookies or ():
+                self._session.cookie_jar.update_cookies({cookie["name"]: cookie["value"]}, URL(self.url))
+        return self._session
+
+    async def _request(self, method, url, data=None):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            async with self._http().request(method, url, data=data) as response:
+                response.raise_for_status()
+                body = await response.read()
+                final_url = str(response.url)
+        finally:
+            self.stats.navigation(url, loop.time() - start)
+        return parsers.parse_document(body, final_url)
+
+    async def _page(self, url):
+        return await self._request("GET", url)
+
+    def _require_login(self):
+        if not self._login:
+            raise PermissionError("Login first using the AsyncAPI.login(...) method")
+
+    async def login(self, username, password):
+        """
+        Log in by posting the index page's login form.
+        """
+        if self._login:
+            return
+
+        action, fields = parsers.parse_form(await self._page(self.url), "username")
+        if action is None:
+            raise LookupError("Couldn't find the login form.")
+
+        fields.update(username=username, password=password)
+        page = await self._request("POST", action, fields)
+
+        if not parsers.is_logged_in(page):
+            page = await self._page(self.url)
+        if not parsers.is_logged_in(page):
+            if parsers.recaptcha(page):
+                raise LookupError("reCAPTCHA required to be solved due to too many incorrect logins")
+            raise LookupError("Invalid credentials.")
+        self._login = True
+
+    async def alert_count_read(self):
+        """
+        Get the amount of alerts the user has
+        """
+        return (await self.pm_alert_count_read())["alerts"]
+
+    async def pm_count_read(self):
+        """
+        Get the PM count of the user
+        """
+        return (await self.pm_alert_count_read())["pms"]
+
+    async def pm_alert_count_read(self):
+        """
+        Retrieve the PM and alert count of the user.
+        """
+        self._require_login()
+        counts = parsers.parse_counts(await self._page(self.url))
+        if counts is None:
+            raise PermissionError("The site didn't serve a logged in page, the session may have expired.")
+        return counts
+
+    async def latest_n_alerts_read(self, n):
+        """
+        Async generator of the latest n alerts (at most
+        forum.max_alert_listing), as dicts like API.latest_n_alerts_read.
+        """
+        self._require_login()
+        if n > forum.max_alert_listing:
+            raise IndexError("Can't retrieve more than %d alerts." % forum.max_alert_listing)
+
+        for alert in parsers.parse_alerts(await self._page(self.alerts_url))[:n]:
+            yield alert._asdict()
+
+    async def _get_profile(self, username=None, uid=None, page_depth=10):
+        if username is None and uid is None:
+            raise Exception("Either provide a username or a UID")
+
+        if uid is None:
+            for page in range(1, page_depth+1):
+                users = parsers.parse_usersearch(await self._page(self.usersearch_url % (username, page)))
+                uid = parsers.match_uid(users, username)
+                if uid is not None or not users:
+                    break
+            if uid is None:
+                raise LookupError("Couldn't find user by username.")
+
+        data = parsers.parse_profile(await self._page(self.profile_url % uid))
+        data["uid"] = str(uid)
+        return data
+
+    async def profile_read(self, username=None, uid=None):
+        """
+        Return all the properties of a user's profile.
+        """
+        self._require_login()
+
+        if self.profile_cache is not None:
+            if uid is None and username is not None:
+                uid = self.profile_cache.uid_for(username)
+            if uid is not None:
+                data = self.profile_cache.get(uid)
+                if data is not None:
+                    return data
+
+        data = await self._get_profile(username, uid)
+        if self.profile_cache is not None:
+            self.profile_cache.put(data)
+        return data
+
+    async def username_to_uid(self, username):
+        """
+        Convert a username to a UID.
+        """
+        self._require_login()
+
+        if self.profile_cache is not None:
+            uid = self.profile_cache.uid_for(username)
+            if uid is not None:
+                return uid
+        return (await self.profile_read(username))["uid"]
+
+    async def pm_send(self, username, title, content):
+        """
+        Send a PM by posting the send form, raises PMSendError or
+        PMFloodError like API.pm_send().
+        """
+        self._require_login()
+
+        if not username[2:]:
+            raise NameError("The name must be longer than 2 characters.")
+        elif not title or not content:
+            raise ValueError("The title and content must be at least 1 character.")
+
+        action, fields = parsers.parse_form(await self._page(self.pm_send_url), "subject")
+        if action is None:
+            raise PMSendError("Couldn't find the PM form.")
+
+        fields.update(to=username, subject=title, message=content)
+        page = await self._request("POST", action, fields)
+
+        general_error = parsers.first_text(page, parsers.pm_send_error)
+        recently_pmed_error = parsers.first_text(page, parsers.pm_flood_error)
+
+        if general_error is not None:
+            if general_error:
+                raise PMSendError(general_error)
+        elif recently_pmed_error is not None:
+            raise PMFloodError(recently_pmed_error, parsers.parse_retry_after(recently_pmed_error))
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
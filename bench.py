@@ -0,0 +1,196 @@
+"""
+Offline benchmark of the API's public methods against a local server
+serving the saved MyBB pages in fixtures/, no network or account needed.
+
+    python bench.py                              # HTTP transport
+    python bench.py -t http -t selenium -n 100   # compare transports
+"""
+import argparse
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import app
+
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """
+    Maps v3rmillion URLs onto the saved pages, member UIDs above
+    known_uids get the invalid member notice and only the first
+    memberlist page has members on it.
+    """
+
+    known_uids = 10
+
+    def log_message(self, *args):
+        pass
+
+    def _fixture(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        path = url.path.lstrip("/") or "index.php"
+        page = int(query.get("page", ["1"])[0])
+
+        if path == "member.php":
+            return "profile" if int(query.get("uid", ["0"])[0]) <= self.known_uids else "profile_invalid"
+        if path == "memberlist.php":
+            return "memberlist" if page == 1 else "memberlist_empty"
+        if path == "alerts.php":
+            return "alerts" if page == 1 else "alerts_last"
+        if path == "private.php":
+            return "private_read" if query.get("action") == ["read"] else "private"
+        if path == "index.php":
+            return "index"
+        return None
+
+    def do_GET(self):
+        name = self._fixture()
+        if name is None:
+            self.send_error(404)
+            return
+
+        with open(os.path.join(fixtures, name + ".html"), "rb") as fp:
+            body = fp.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FixtureServer(object):
+    """
+    The fixture server running in a background thread, use it as a
+    context manager and point API(base_url=...) at self.url.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.server = ThreadingHTTPServer((host, port), FixtureHandler)
+        self.url = "http://%s:%d" % self.server.server_address
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Counting(object):
+    """
+    Proxy counting what goes through a webdriver or HTTP transport, any
+    public attribute read on a webdriver is a command sent to it (a
+    round trip) and get/refresh calls are page loads.
+    """
+
+    page_loads_by = ("get", "refresh")
+
+    def __init__(self, target):
+        self._target = target
+        self.page_loads = 0
+        self.round_trips = 0
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not name.startswith("_"):
+            self.round_trips += 1
+            if name in self.page_loads_by:
+                self.page_loads += 1
+        return value
+
+
+calls = (
+    ("profile_read", lambda api: api.profile_read(uid=1)),
+    ("username_to_uid", lambda api: api.username_to_uid("alice")),
+    ("latest_n_alerts_read", lambda api: list(api.latest_n_alerts_read(10))),
+    ("pm_read", lambda api: api.pm_read("user3", "Subject 3")),
+    ("pm_alert_count_read", lambda api: api.pm_alert_count_read()),
+    ("iter_alerts", lambda api: list(api.iter_alerts(since=985))),
+)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def bench(base_url, transport="http", driver=None, iterations=50):
+    """
+    Run every call iterations times on a fresh API and return a row per
+    call with its latency percentiles (ms) and per-call page loads and
+    driver round trips. Caches are off so every call pays its real cost.
+    """
+    api = app.API(transport=transport, base_url=base_url, driver=driver, profile_cache=False)
+    api._login = True  # the fixture server doesn't check sessions
+    api.counts_max_age = 0
+
+    if transport == "http":
+        api.http = counter = Counting(api.http)
+    else:
+        api._driver = counter = Counting(api.driver)
+
+    rows = []
+    try:
+        for name, call in calls:
+            call(api)  # warm up connections and the navigation state
+
+            loads, trips = counter.page_loads, counter.round_trips
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                call(api)
+                samples.append((time.perf_counter() - start) * 1000)
+
+            rows.append({
+                "transport": transport,
+                "method": name,
+                "p50": percentile(samples, 0.5),
+                "p90": percentile(samples, 0.9),
+                "p99": percentile(samples, 0.99),
+                "page_loads": (counter.page_loads - loads) / iterations,
+                "round_trips": (counter.round_trips - trips) / iterations if transport != "http" else 0,
+            })
+    finally:
+        if transport != "http":
+            api._driver = counter._target
+        api.quit()
+    return rows
+
+
+def report(rows):
+    header = "%-10s %-22s %9s %9s %9s %11s %12s" % (
+        "transport", "method", "p50 ms", "p90 ms", "p99 ms", "loads/call", "driver/call"
+    )
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print("%-10s %-22s %9.2f %9.2f %9.2f %11.2f %12.2f" % (
+            row["transport"], row["method"], row["p50"], row["p90"], row["p99"],
+            row["page_loads"], row["round_trips"]
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-t", "--transport", action="append", choices=("http", "selenium"),
+                        help="transport to benchmark, can be repeated (default: http)")
+    parser.add_argument("-d", "--driver", default=None, help="webdriver for the selenium transport")
+    parser.add_argument("-n", "--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = []
+    with FixtureServer() as server:
+        for transport in args.transport or ["http"]:
+            rows.extend(bench(server.url, transport, args.driver, args.iterations))
+    report(rows)
+
+
+if __name__ == "__main__":
+    main()
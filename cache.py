@@ -0,0 +1,123 @@
+"""
+In-process profile cache used by the API's profile readers.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class ProfileCache(object):
+    """
+    Bounded LRU cache of profiles keyed by UID where every field has its
+    own time to live, volatile fields such as the status expire quickly
+    while the ones that barely ever change are kept for much longer.
+    """
+
+    default_ttl = 300
+    field_ttls = {
+        "status": 30,
+        "last_visit": 30,
+        "time_spent_online": 60,
+        "reputation": 300,
+        "post_count": 300,
+        "thread_count": 300,
+        "members_referred": 3600,
+        "username": 3600,
+        "signature": 3600,
+        "joined": 86400,
+    }
+
+    def __init__(self, max_size=1024, field_ttls=None, clock=time.monotonic):
+        self.max_size = max_size
+        self.field_ttls = dict(self.field_ttls, **(field_ttls or {}))
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # uid -> {field: (value, stored_at)}
+        self._uids = {}  # lowercased username -> uid
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _fresh(self, field, stored_at, now):
+        return now - stored_at < self.field_ttls.get(field, self.default_ttl)
+
+    def get(self, uid, fields=None):
+        """
+        Return the cached profile of uid if every field in fields (all
+        of the cached ones by default) is still fresh, otherwise None.
+        """
+        uid = str(uid)
+        now = self.clock()
+
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            for field in fields or entry:
+                if field not in entry or not self._fresh(field, entry[field][1], now):
+                    self.misses += 1
+                    return None
+
+            self._entries.move_to_end(uid)
+            self.hits += 1
+            data = {field: value for field, (value, _) in entry.items()}
+            data["uid"] = uid
+            return data
+
+    def put(self, profile):
+        """
+        Store a profile as returned by API._get_profile(), it has to
+        carry its "uid".
+        """
+        uid = str(profile["uid"])
+        now = self.clock()
+
+        with self._lock:
+            entry = self._entries.setdefault(uid, {})
+            entry.update((field, (value, now)) for field, value in profile.items() if field != "uid")
+            self._entries.move_to_end(uid)
+
+            if "username" in profile:
+                self._uids[profile["username"].lower()] = uid
+
+            while len(self._entries) > self.max_size:
+                self._forget(*self._entries.popitem(last=False))
+
+    def uid_for(self, username):
+        """
+        UID of a username seen in a cached profile, or None.
+        """
+        with self._lock:
+            return self._uids.get(username.lower())
+
+    def invalidate(self, uid=None, username=None):
+        """
+        Drop the cached profile of a UID or username, or everything if
+        neither is given.
+        """
+        with self._lock:
+            if uid is None and username is None:
+                self._entries.clear()
+                self._uids.clear()
+                return
+
+            if uid is None:
+                uid = self._uids.get(username.lower())
+            entry = self._entries.pop(str(uid), None)
+            if entry is not None:
+                self._forget(str(uid), entry)
+
+    def _forget(self, uid, entry):
+        if "username" in entry and self._uids.get(entry["username"][0].lower()) == uid:
+            del self._uids[entry["username"][0].lower()]
+
+    def stats(self):
+        """
+        Hit/miss counters and the current size of the cache.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
@@ -0,0 +1,41 @@
+"""
+URLs and limits of the site, shared by the API and the AsyncAPI so the
+latter doesn't have to import selenium to know where to go.
+"""
+
+site = "https://v3rmillion.net"
+url = "https://v3rmillion.net/index.php"
+alerts_url = "https://v3rmillion.net/alerts.php"
+alerts_page_url = "https://v3rmillion.net/alerts.php?page=%d"
+pm_url = "https://v3rmillion.net/private.php"
+pm_send_url = "https://v3rmillion.net/private.php?action=send"
+pm_folder_url = "https://v3rmillion.net/private.php?fid=%s&page=%d"
+pm_read_url = "https://v3rmillion.net/private.php?action=read&pmid=%s"
+usersearch_url = "https://v3rmillion.net/memberlist.php?sort=username&order=ascending&perpage=500&username=%s&page=%d"
+profile_url = "https://v3rmillion.net/member.php?action=profile&uid=%s"
+
+# names of the URLs above which base_url rewrites
+site_urls = (
+    "url", "alerts_url", "alerts_page_url", "pm_url", "pm_send_url", "pm_folder_url", "pm_read_url",
+    "usersearch_url", "profile_url"
+)
+
+# PM folders, the listings of sent items and drafts name the recipient
+# in the column where the others have the sender
+inbox_fid = 1
+recipient_fids = (2, 3)
+
+max_alert_listing = 10
+memberlist_page_size = 500
+
+user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/69.0 Safari/537.36"
+
+
+def site_url(name, base_url=None):
+    """
+    The URL called name, pointed at base_url instead of the site if given.
+    """
+    value = globals()[name]
+    if base_url is not None:
+        value = value.replace(site, base_url.rstrip("/"), 1)
+    return value
@@ -0,0 +1,231 @@
+"""
+Instrumentation of the API: page loads, element lookups and wall time
+per public method and per URL, as an in-process snapshot and as events
+passed to subscribed callbacks (e.g. to export them to a metrics system).
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+def url_key(url):
+    """
+    Group URLs by page rather than by query, e.g. every profile becomes
+    "/member.php?action=profile".
+    """
+    parts = urlsplit(url)
+    action = parse_qs(parts.query).get("action")
+    if action:
+        return "%s?action=%s" % (parts.path, action[0])
+    return parts.path or "/"
+
+
+class Stats(object):
+    """
+    Thread-safe counters of API activity. Method counters cover every
+    call of a public method (nested calls count towards the outer method
+    too), URL counters every page load whichever thread made it.
+
+    Subscribed callbacks get an event dict per finished method call
+    ({"kind": "call", "method", "time", "navigations", "lookups",
+    "snapshots", "error"}) and per page load ({"kind": "navigation",
+    "url", "time", "method"}).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.callbacks = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.methods = {}
+            self.urls = {}
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self.callbacks.remove(callback)
+
+    def _emit(self, event):
+        # a failing exporter mustn't fail the API call being recorded
+        for callback in list(self.callbacks):
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Stats callback %r failed", callback)
+
+    def _frames(self):
+        frames = getattr(self._local, "frames", None)
+        if frames is None:
+            frames = self._local.frames = []
+        return frames
+
+    def begin(self, method):
+        """
+        Mark the start of a public method call on this thread, end() has
+        to be called with the returned frame.
+        """
+        frame = {
+            "method": method, "navigations": 0, "lookups": 0, "snapshots": 0,
+            "time": 0.0, "start": time.perf_counter()
+        }
+        self._frames().append(frame)
+        return frame
+
+    def suspend(self, frame):
+        """
+        Take a frame off this thread while the caller has control, used
+        for generators which only do work while they're being consumed.
+        """
+        frame["time"] += time.perf_counter() - frame["start"]
+        frame["start"] = None
+        self._frames().remove(frame)
+
+    def resume(self, frame):
+        frame["start"] = time.perf_counter()
+        self._frames().append(frame)
+
+    def end(self, frame, error=None):
+        """
+        Record a finished call, a frame is only recorded once.
+        """
+        if frame.get("ended"):
+            return
+        frame["ended"] = True
+        if frame["start"] is not None:
+            self.suspend(frame)
+        elapsed = frame["time"]
+
+        with self._lock:
+            method = self.methods.setdefault(frame["method"], {
+                "calls": 0, "errors": 0, "time": 0.0, "navigations": 0, "lookups": 0, "snapshots": 0
+            })
+            method["calls"] += 1
+            method["errors"] += error is not None
+            method["time"] += elapsed
+            for counter in ("navigations", "lookups", "snapshots"):
+                method[counter] += frame[counter]
+
+        self._emit({
+            "kind": "call", "method": frame["method"], "time": elapsed, "navigations": frame["navigations"],
+            "lookups": frame["lookups"], "snapshots": frame["snapshots"], "error": error
+        })
+
+    def frames(self):
+        """
+        The frames of the method calls running on this thread, to hand
+        to worker threads doing work for them with working_for().
+        """
+        return list(self._frames())
+
+    @contextmanager
+    def working_for(self, frames):
+        """
+        Count what this (worker) thread does towards frames taken from
+        another thread with frames() until the block exits.
+        """
+        previous = self._frames()
+        self._local.frames = previous + frames
+        try:
+            yield
+        finally:
+            self._local.frames = previous
+
+    def _count(self, counter):
+        # frames can be shared with worker threads, see working_for()
+        with self._lock:
+            for frame in self._frames():
+                frame[counter] += 1
+
+    def navigation(self, url, elapsed):
+        """
+        Record a page load (webdriver get/refresh or HTTP request).
+        """
+        self._count("navigations")
+        key = url_key(url)
+        frames = self._frames()
+
+        with self._lock:
+            page = self.urls.setdefault(key, {"navigations": 0, "time": 0.0})
+            page["navigations"] += 1
+            page["time"] += elapsed
+
+        self._emit({
+            "kind": "navigation", "url": key, "time": elapsed,
+            "method": frames[0]["method"] if frames else None
+        })
+
+    def lookup(self):
+        self._count("lookups")
+
+    def snapshot_read(self):
+        self._count("snapshots")
+
+    def snapshot(self):
+        """
+        A copy of the counters, {"methods": {name: counters}, "urls":
+        {url: counters}}, with the mean time per call/load added.
+        """
+        with self._lock:
+            methods = {name: dict(counters) for name, counters in self.methods.items()}
+            urls = {key: dict(counters) for key, counters in self.urls.items()}
+
+        for counters in methods.values():
+            counters["mean_time"] = counters["time"] / counters["calls"]
+        for counters in urls.values():
+            counters["mean_time"] = counters["time"] / counters["navigations"]
+        return {"methods": methods, "urls": urls}
+
+
+shared_stats = Stats()  # process wide, used by API and AsyncAPI by default
+
+
+class InstrumentedDriver(object):
+    """
+    Webdriver proxy reporting page loads, element lookups and page_source
+    reads to a Stats, everything else is passed through untouched.
+    """
+
+    navigations = ("get", "refresh")
+
+    def __init__(self, driver, stats):
+        self._driver = driver
+        self._stats = stats
+
+    @property
+    def wrapped_driver(self):
+        return self._driver
+
+    @property
+    def page_source(self):
+        self._stats.snapshot_read()
+        return self._driver.page_source
+
+    def __getattr__(self, name):
+        value = getattr(self._driver, name)
+
+        if name in self.navigations:
+            def navigate(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return value(*args, **kwargs)
+                finally:
+                    url = args[0] if args else self._driver.current_url
+                    self._stats.navigation(url, time.perf_counter() - start)
+            return navigate
+
+        if name.startswith("find_element"):
+            def find(*args, **kwargs):
+                self._stats.lookup()
+                return value(*args, **kwargs)
+            return find
+
+        return value
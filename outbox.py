@@ -0,0 +1,187 @@
+"""
+Outbound PM queue which paces API.pm_send() around the site's flood
+control instead of failing halfway through a batch.
+"""
+import threading
+import time
+from collections import deque
+
+
+class PMSendError(Exception):
+    """
+    The site refused to send a PM.
+    """
+
+
+class PMFloodError(PMSendError):
+    """
+    The site's flood control refused a PM, retry_after is the number of
+    seconds it asked to wait (None if the notice didn't say).
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class OutgoingPM(object):
+    """
+    A queued PM and its delivery status, which is one of "queued",
+    "waiting" (held back by flood control), "sent" or "failed".
+    """
+
+    __slots__ = ("username", "title", "content", "status", "attempts", "error", "sent_at", "not_before")
+
+    def __init__(self, username, title, content):
+        self.username = username
+        self.title = title
+        self.content = content
+        self.status = "queued"
+        self.attempts = 0
+        self.error = None
+        self.sent_at = None
+        self.not_before = 0
+
+    def __repr__(self):
+        return "<OutgoingPM to %r %r: %s>" % (self.username, self.title, self.status)
+
+
+class PMQueue(object):
+    """
+    Sends queued PMs one at a time through an API. The gap between two
+    sends starts at min_interval and is widened to the flood control
+    window the site reports, so once it's learnt the queue runs as fast
+    as the limit allows without tripping it again. A flood-controlled PM
+    is retried after the delay the site asked for, any other error
+    fails that PM only.
+    """
+
+    min_interval = 0
+    flood_wait = 60  # used when the flood notice doesn't say how long to wait
+    max_attempts = 5
+
+    def __init__(self, api, min_interval=None, max_attempts=None, on_status=None):
+        self.api = api
+        self.on_status = on_status
+
+        if min_interval is not None:
+            self.min_interval = min_interval
+        if max_attempts is not None:
+            self.max_attempts = max_attempts
+
+        self.interval = self.min_interval
+        self._last_sent = None
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._stop = False
+        self._thread = None
+
+    def __len__(self):
+        with self._condition:
+            return len(self._pending)
+
+    def put(self, username, title, content):
+        """
+        Queue a PM and return its OutgoingPM status record.
+        """
+        pm = OutgoingPM(username, title, content)
+        with self._condition:
+            self._pending.append(pm)
+            self._condition.notify()
+        return pm
+
+    def _report(self, pm, status, error=None):
+        pm.status = status
+        pm.error = error
+        if self.on_status is not None:
+            self.on_status(pm)
+
+    def _next_at(self, pm):
+        earliest = pm.not_before
+        if self._last_sent is not None:
+            earliest = max(earliest, self._last_sent + self.interval)
+        return earliest
+
+    def send_next(self):
+        """
+        Send the PM at the head of the queue, waiting out the schedule
+        first. Returns it once it has settled (sent, failed, or put back
+        as waiting), None if the queue is empty or stop() was called
+        while waiting (the PM then stays at the head of the queue).
+        """
+        with self._condition:
+            if not self._pending:
+                return None
+            pm = self._pending.popleft()
+
+            delay = self._next_at(pm) - time.monotonic()
+            if delay > 0 and self._condition.wait_for(lambda: self._stop, delay):
+                self._pending.appendleft(pm)
+                return None
+
+        pm.attempts += 1
+        try:
+            self.api.pm_send(pm.username, pm.title, pm.content)
+        except PMFloodError as exc:
+            now = time.monotonic()
+            retry_after = exc.retry_after if exc.retry_after is not None else self.flood_wait
+            if self._last_sent is not None:
+                # the window is whatever passed since the last PM plus what's left of it
+                self.interval = max(self.interval, now - self._last_sent + retry_after)
+
+            if pm.attempts >= self.max_attempts:
+                self._report(pm, "failed", exc)
+            else:
+                pm.not_before = now + retry_after
+                with self._condition:
+                    self._pending.appendleft(pm)
+                self._report(pm, "waiting", exc)
+        except Exception as exc:
+            self._report(pm, "failed", exc)
+        else:
+            self._last_sent = time.monotonic()
+            pm.sent_at = time.time()
+            self._report(pm, "sent")
+        return pm
+
+    def drain(self):
+        """
+        Send everything queued, yielding each OutgoingPM once it's sent
+        or has failed for good.
+        """
+        while True:
+            pm = self.send_next()
+            if pm is None:
+                return
+            if pm.status != "waiting":
+                yield pm
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stop:
+                    self._condition.wait()
+                if self._stop:
+                    return
+            self.send_next()
+
+    def start(self):
+        """
+        Send queued PMs from a background thread as they're put().
+        """
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the background sender once the PM being sent is done,
+        anything left stays queued.
+        """
+        with self._condition:
+            self._stop = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
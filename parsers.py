@@ -0,0 +1,399 @@
+"""
+HTML extractors for the v3rmillion (MyBB) pages used by the API, they
+work on raw HTML so they can be fed by the HTTP transport, a webdriver's
+page_source or a page saved to disk.
+"""
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from lxml import etree, html
+
+
+XPath = etree.XPath
+
+content = "/html/body/div[3]/div/div[2]"
+
+# selectors are compiled once at import, a page is then read with a
+# single local pass instead of a driver round trip per field
+
+recaptcha = XPath("//*[contains(@class, 'g-recaptcha') or contains(@src, 'recaptcha')]")
+logout_link = XPath("//a[contains(@href, 'action=logout')]")
+login_form = XPath("//input[@name='username']")
+
+alert_count = XPath("//span[contains(@class, 'alert_count alert_new')]")
+pm_count = XPath("//span[contains(@class, 'pm_count pm_new')]")
+
+profile_error = XPath(content + "/table/tbody/tr[2]/td")
+profile_error_text = "The member you specified is either invalid or doesn't exist."
+profile_online = XPath(content + "/fieldset/table/tbody/tr/td[1]/span[2]/a[1]/span")
+profile_status = XPath(content + "/fieldset/table/tbody/tr/td[1]/span[2]/span")
+
+profile_info = content + "/table/tbody/tr/td[1]/table[1]/tbody"
+profile_text_fields = (
+    ("username", XPath(content + "/fieldset/table/tbody/tr/td[1]/span[1]/strong/span/strong")),
+    ("last_visit", XPath(profile_info + "/tr[3]/td[2]")),
+    ("joined", XPath(profile_info + "/tr[2]/td[2]")),
+    ("time_spent_online", XPath(profile_info + "/tr[6]/td[2]")),
+    ("signature", XPath(content + "/table/tbody/tr/td[3]/table[1]/tbody/tr[2]/td")),
+    ("members_referred", XPath(profile_info + "/tr[7]/td[2]")),
+)
+profile_int_fields = (
+    ("thread_count", XPath(profile_info + "/tr[5]/td[2]")),
+    ("post_count", XPath(profile_info + "/tr[4]/td[2]")),
+    ("reputation", XPath(profile_info + "/tr[8]/td[2]/strong")),
+)
+
+usersearch_error = XPath(content + "/table/tbody/tr[3]/td")
+usersearch_error_text = "There were no members found with the search criteria you entered."
+usersearch_rows = XPath(content + "/table/tbody/tr")
+usersearch_headings = XPath("./td[contains(@class, 'tcat')]")
+
+alert_rows = XPath("//tbody[contains(@id, 'latestAlertsListing')]//tr[contains(@class, 'alert-row')]")
+alert_cells = XPath(".//td[contains(@class, 'trow')]")
+alert_avatar = XPath(".//*[contains(concat(' ', @class, ' '), ' avatar ')]//img/@src")
+alert_username = XPath(".//a/span[@style]")
+alert_action = XPath(".//a")
+
+pm_rows = XPath(content + "/form/table/tbody/tr/td[2]/table/tbody/tr")
+pm_message = XPath("//*[@id='pid_']")
+pm_send_error = XPath(content + "/form/table/tbody/tr/td[2]/div[1]")
+pm_flood_error = XPath(content + "/table/tbody/tr[2]/td")
+pm_folders = XPath(content + "/form/table/tbody/tr/td[1]//a[contains(@href, 'fid=')]")
+next_page = XPath("//a[contains(@class, 'pagination_next')]")
+
+submit_buttons = XPath(".//input[@type='submit'][@name]")
+tables_without_tbody = XPath("//table[tr]")
+links = XPath(".//a[@href]")
+cells = XPath(".//td")
+
+uid_from_url = re.compile(r".+\?.+uid=(\d+)")
+alert_id = re.compile(r"\D*(\d+)$")
+url_id = re.compile(r".+\?.*\b%s=(\d+)")
+relative_date = re.compile(r"(\d+) (second|minute|hour|day)s? ago")
+duration = re.compile(r"(\d+)\s*(second|sec|minute|min|hour|day|week|month|year)s?\b", re.I)
+duration_units = {
+    "second": 1, "sec": 1, "minute": 60, "min": 60, "hour": 3600, "day": 86400,
+    "week": 7 * 86400, "month": 30 * 86400, "year": 365 * 86400
+}
+
+Member = namedtuple("Member", "uid username post_count joined")
+PM = namedtuple("PM", "pmid title sender date link")
+Alert = namedtuple("Alert", "id username action time date avatar_link")
+
+date_formats = ("%m-%d-%Y, %I:%M %p", "%m-%d-%Y")
+
+
+def parse_document(source, url=None):
+    """
+    Parse raw HTML into an lxml tree, <tbody> elements are inserted
+    where the markup omitted them (as a browser would) so that the
+    same XPaths work on raw HTML and on a webdriver's page_source.
+    """
+    tree = html.document_fromstring(source, base_url=url)
+
+    for table in tables_without_tbody(tree):
+        tbody = None
+        for child in list(table):
+            if child.tag != "tr":
+                tbody = None
+                continue
+            if tbody is None:
+                tbody = html.Element("tbody")
+                child.addprevious(tbody)
+            tbody.append(child)
+
+    # selenium renders <br> as a line break in .text, so do the same
+    for br in tree.iter("br"):
+        br.tail = "\n" + (br.tail or "")
+
+    if url is not None:
+        tree.make_links_absolute(url)
+    return tree
+
+
+def text(element):
+    """
+    Visible text of an element with whitespace collapsed the way
+    selenium's WebElement.text does it.
+    """
+    lines = (" ".join(line.split()) for line in element.text_content().splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def first_text(tree, selector, default=None):
+    found = selector(tree)
+    if not found:
+        return default
+    return text(found[0])
+
+
+def _count(tree, xpath):
+    try:
+        return int(first_text(tree, xpath, ""))
+    except ValueError:
+        return 0
+
+
+def _url_id(url, name):
+    match = re.match(url_id.pattern % name, url or "")
+    return int(match.groups()[0]) if match else None
+
+
+def parse_date(value, now=None):
+    """
+    Turn a MyBB date ("10-16-2026, 04:12 PM", "10-16-2026", "Today,
+    04:12 PM", "Yesterday, ..." or "5 minutes ago") into a datetime,
+    None if it isn't one (e.g. "(Hidden)").
+    """
+    value = value.strip()
+    now = now or datetime.now()
+
+    for day, offset in (("Today", 0), ("Yesterday", 1)):
+        if value.startswith(day):
+            try:
+                clock = datetime.strptime(value.split(",", 1)[1].strip(), "%I:%M %p")
+            except (IndexError, ValueError):
+                return None
+            date = now - timedelta(days=offset)
+            return date.replace(hour=clock.hour, minute=clock.minute, second=0, microsecond=0)
+
+    match = relative_date.search(value)
+    if match:
+        return now - timedelta(**{match.groups()[1] + "s": int(match.groups()[0])})
+
+    for date_format in date_formats:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    return None
+
+
+def parse_retry_after(value):
+    """
+    Number of seconds a flood control notice ("... please wait another
+    1 minute, 30 seconds ...") asks to wait, None if it names none. Only
+    the part after "wait" is read when there is one, the notice usually
+    names the flood window before it.
+    """
+    wait = value.lower().rfind("wait")
+    return parse_duration(value[wait:] if wait != -1 else value)
+
+
+def parse_duration(value):
+    """
+    Turn a MyBB time span ("12 Days, 3 Hours, 41 Minutes") into seconds,
+    None if it names none (e.g. "(Hidden)"). Months count as 30 days.
+    """
+    found = duration.findall(value)
+    if not found:
+        return None
+    return sum(int(amount) * duration_units[unit.lower()] for amount, unit in found)
+
+
+def _document(tree):
+    if isinstance(tree, (str, bytes)):
+        return parse_document(tree)
+    return tree
+
+
+def _int(value):
+    return int(value.split('(')[0].replace(",", ""))
+
+
+def is_logged_in(tree):
+    """
+    Whether a page was served to a logged in user, it then has a logout
+    link in the header and no login form.
+    """
+    tree = _document(tree)
+    return bool(logout_link(tree)) and not login_form(tree)
+
+
+def parse_form(tree, field):
+    """
+    Return the action and the values a browser would submit (through
+    the form's first submit button) for the first form with a field
+    named field, (None, None) if there's none.
+    """
+    for form in _document(tree).forms:
+        if field in form.inputs.keys():
+            values = dict(form.form_values())
+            for button in submit_buttons(form)[:1]:
+                values[button.get("name")] = button.get("value", "")
+            return form.action, values
+    return None, None
+
+
+def parse_counts(tree):
+    """
+    Read the alert and PM counters from the header that's present on
+    every page once logged in, None if the page wasn't served to a
+    logged in user (e.g. a redirect notice) and so has no header.
+    """
+    tree = _document(tree)
+    if not is_logged_in(tree):
+        return None
+    return {
+        "alerts": _count(tree, alert_count),
+        "pms": _count(tree, pm_count)
+    }
+
+
+def parse_profile(tree):
+    """
+    Extract the profile fields from a member.php?action=profile page
+    (a parsed tree or its raw HTML), raises LookupError if the page is
+    the invalid member notice.
+    """
+    tree = _document(tree)
+
+    if profile_error_text in first_text(tree, profile_error, ""):
+        raise LookupError("Couldn't find user by UID.")
+
+    data = {name: first_text(tree, selector, "") for name, selector in profile_text_fields}
+    data.update((name, _int(first_text(tree, selector, ""))) for name, selector in profile_int_fields)
+
+    if profile_online(tree):
+        data["status"] = "Online"
+    else:
+        data["status"] = first_text(tree, profile_status, "Offline")
+    return data
+
+
+def parse_usersearch(tree):
+    """
+    Return (username, uid) pairs for every row of a memberlist.php page,
+    raises LookupError if the search didn't match anyone.
+    """
+    return [(member.username, member.uid) for member in parse_memberlist(tree)]
+
+
+def match_uid(users, username):
+    """
+    UID of username among (username, uid) pairs from parse_usersearch(),
+    usernames are compared the way the site does (case-insensitively).
+    None if it isn't one of them.
+    """
+    username = username.lower()
+    return next((uid for name, uid in users if name.lower() == username), None)
+
+
+def parse_memberlist(tree):
+    """
+    Return a Member record for every row of a memberlist.php page, the
+    columns are located through the table's headings. Raises LookupError
+    if the search didn't match anyone.
+    """
+    tree = _document(tree)
+
+    if usersearch_error_text in first_text(tree, usersearch_error, ""):
+        raise LookupError("Couldn't find user by username.")
+
+    columns = {}
+    members = []
+    for row in usersearch_rows(tree):
+        headings = usersearch_headings(row)
+        if headings:
+            columns = {text(heading).lower(): index for index, heading in enumerate(headings)}
+            continue
+
+        row_cells = cells(row)
+        for link in links(row):
+            match = uid_from_url.match(link.get("href"))
+            if match:
+                break
+        else:
+            continue
+
+        def column(name):
+            index = columns.get(name)
+            if index is None or index >= len(row_cells):
+                return None
+            return text(row_cells[index])
+
+        post_count = column("posts")
+        members.append(Member(
+            match.groups()[0],
+            text(link),
+            _int(post_count) if post_count else None,
+            column("joined")
+        ))
+    return members
+
+
+def parse_alerts(tree, now=None):
+    """
+    Return an Alert record for every row of an alerts.php listing,
+    newest first, the id is the alert's numeric row id and date is its
+    time as a datetime.
+    """
+    alerts = []
+    for row in alert_rows(_document(tree)):
+        row_cells = alert_cells(row)
+        if len(row_cells) != 3:
+            continue
+        user_data, alert_data, date = row_cells
+        avatar = alert_avatar(user_data)
+        row_id = alert_id.match(row.get("id", ""))
+        alerts.append(Alert(
+            int(row_id.groups()[0]) if row_id else None,
+            first_text(alert_data, alert_username, ""),
+            first_text(alert_data, alert_action, ""),
+            text(date),
+            parse_date(text(date), now),
+            avatar[0] if avatar else None
+        ))
+    return alerts
+
+
+def parse_pm_listing(tree):
+    """
+    Return a PM record (pmid, title, sender, date, link) for every PM
+    listed on a private.php folder page, newest first. On the sent items
+    and drafts pages (forum.recipient_fids) sender is the recipient.
+    """
+    pms = []
+    for row in pm_rows(_document(tree))[2:-1]:
+        row_cells = cells(row)
+        row_links = links(row)
+        if len(row_cells) < 4 or not row_links:
+            continue
+        link = row_links[0].get("href")
+        pms.append(PM(
+            _url_id(link, "pmid"),
+            text(row_cells[2]),
+            text(row_cells[3]),
+            text(row_cells[4]) if len(row_cells) > 4 else None,
+            link
+        ))
+    return pms
+
+
+def parse_pm_folders(tree):
+    """
+    Return (fid, name) for every folder linked from a private.php page.
+    """
+    folders = []
+    seen = set()
+    for link in pm_folders(_document(tree)):
+        fid = _url_id(link.get("href"), "fid")
+        if fid is not None and fid not in seen:
+            seen.add(fid)
+            folders.append((fid, text(link)))
+    return folders
+
+
+def has_next_page(tree):
+    """
+    Whether a paginated listing has a page after this one.
+    """
+    return bool(next_page(_document(tree)))
+
+
+def parse_pm_message(tree):
+    """
+    Return the body of the PM shown on a private.php?action=read page.
+    """
+    return first_text(_document(tree), pm_message)
@@ -0,0 +1,195 @@
+"""
+Typed profile records and a bulk exporter which streams many of them to
+CSV, Parquet or plain (or NumPy) columns for analytics.
+"""
+import csv
+import os
+from datetime import datetime
+
+import parsers
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class Profile(object):
+    """
+    A profile_read() dict with its fields parsed once: uid, the counters
+    and members_referred are ints, last_visit and joined datetimes and
+    time_spent_online a number of seconds. Fields the member hides (or
+    the page didn't have) are None.
+    """
+
+    __slots__ = (
+        "uid", "username", "status", "last_visit", "joined", "time_spent_online",
+        "members_referred", "thread_count", "post_count", "reputation", "signature"
+    )
+
+    # column types for the exporters
+    types = {
+        "uid": "int", "username": "str", "status": "str", "last_visit": "datetime",
+        "joined": "datetime", "time_spent_online": "int", "members_referred": "int",
+        "thread_count": "int", "post_count": "int", "reputation": "int", "signature": "str"
+    }
+
+    def __init__(self, uid, username, status=None, last_visit=None, joined=None, time_spent_online=None,
+                 members_referred=None, thread_count=None, post_count=None, reputation=None, signature=None):
+        self.uid = uid
+        self.username = username
+        self.status = status
+        self.last_visit = last_visit
+        self.joined = joined
+        self.time_spent_online = time_spent_online
+        self.members_referred = members_referred
+        self.thread_count = thread_count
+        self.post_count = post_count
+        self.reputation = reputation
+        self.signature = signature
+
+    @classmethod
+    def from_dict(cls, data, now=None):
+        """
+        Build a record from a profile dict, relative dates ("Today, ...",
+        "5 minutes ago") are resolved against now.
+        """
+        return cls(
+            uid=int(data["uid"]),
+            username=data["username"],
+            status=data.get("status"),
+            last_visit=_date(data.get("last_visit"), now),
+            joined=_date(data.get("joined"), now),
+            time_spent_online=parsers.parse_duration(data.get("time_spent_online") or ""),
+            members_referred=_int(data.get("members_referred")),
+            thread_count=_int(data.get("thread_count")),
+            post_count=_int(data.get("post_count")),
+            reputation=_int(data.get("reputation")),
+            signature=data.get("signature"),
+        )
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if not isinstance(other, Profile):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return "<Profile %d %r>" % (self.uid, self.username)
+
+
+def _date(value, now=None):
+    if not value:
+        return None
+    return parsers.parse_date(value, now)
+
+
+def _int(value):
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        return int(value.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _records(profiles):
+    for profile in profiles:
+        yield profile if isinstance(profile, Profile) else Profile.from_dict(profile)
+
+
+def to_columns(profiles, as_numpy=False):
+    """
+    One list per field for an iterable of Profile records (or profile
+    dicts), or NumPy arrays with as_numpy=True: ints become int64
+    (float64 with NaN if any value is missing), datetimes
+    datetime64[s] with NaT and strings object arrays.
+    """
+    if as_numpy and numpy is None:
+        raise ImportError("[1] Make sure to install numpy to export NumPy columns.")
+
+    columns = {name: [] for name in Profile.__slots__}
+    appends = [(name, columns[name].append) for name in Profile.__slots__]
+    for profile in _records(profiles):
+        for name, append in appends:
+            append(getattr(profile, name))
+
+    if as_numpy:
+        for name, values in columns.items():
+            kind = Profile.types[name]
+            if kind == "int":
+                if None in values:
+                    columns[name] = numpy.array([numpy.nan if v is None else v for v in values], dtype="float64")
+                else:
+                    columns[name] = numpy.array(values, dtype="int64")
+            elif kind == "datetime":
+                columns[name] = numpy.array(values, dtype="datetime64[s]")
+            else:
+                columns[name] = numpy.array(values, dtype=object)
+    return columns
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def _write_csv(records, path):
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(Profile.__slots__)
+        for profile in records:
+            writer.writerow([_csv_value(getattr(profile, name)) for name in Profile.__slots__])
+            written += 1
+    return written
+
+
+def _write_parquet(records, path, batch_size):
+    if pyarrow is None:
+        raise ImportError("[1] Make sure to install pyarrow to export Parquet files.")
+
+    arrow_types = {"int": pyarrow.int64(), "str": pyarrow.string(), "datetime": pyarrow.timestamp("s")}
+    schema = pyarrow.schema([(name, arrow_types[Profile.types[name]]) for name in Profile.__slots__])
+
+    written = 0
+    batch = []
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for profile in records:
+            batch.append(profile)
+            if len(batch) >= batch_size:
+                writer.write_table(pyarrow.Table.from_pydict(to_columns(batch), schema=schema))
+                written += len(batch)
+                batch = []
+        if batch or not written:
+            writer.write_table(pyarrow.Table.from_pydict(to_columns(batch), schema=schema))
+            written += len(batch)
+    return written
+
+
+def export_profiles(profiles, path, format=None, batch_size=10000):
+    """
+    Stream Profile records (or profile dicts, e.g. straight out of
+    profile_read_many()) to a CSV or Parquet file and return how many
+    were written. The format defaults to the file's extension, Parquet
+    is written batch_size rows at a time so memory use stays flat.
+    """
+    if format is None:
+        format = os.path.splitext(path)[1].lstrip(".").lower()
+
+    if format == "csv":
+        return _write_csv(_records(profiles), path)
+    if format == "parquet":
+        return _write_parquet(_records(profiles), path, batch_size)
+    raise ValueError("Unknown export format %r, use \"csv\" or \"parquet\"." % format)
@@ -0,0 +1,96 @@
+"""
+Encrypted on-disk store of login cookies, so a new process can pick up
+an existing session instead of going through API.login() again.
+"""
+import base64
+import json
+import os
+import threading
+import time
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:
+    Fernet = None
+
+
+class SessionStore(object):
+    """
+    Keeps the webdriver cookies of every account in a single file which
+    is encrypted with a key derived from passphrase. The file starts with
+    the random salt of the key derivation, the rest is a Fernet token.
+    """
+
+    salt_size = 16
+    iterations = 200000
+
+    def __init__(self, path, passphrase):
+        if Fernet is None:
+            raise ImportError("[1] Make sure to install cryptography to persist login sessions.")
+
+        self.path = path
+        self._passphrase = passphrase.encode() if isinstance(passphrase, str) else passphrase
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "rb") as fp:
+                self._salt = fp.read(self.salt_size)
+        else:
+            self._salt = os.urandom(self.salt_size)
+
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=self._salt, iterations=self.iterations)
+        self._fernet = Fernet(base64.urlsafe_b64encode(kdf.derive(self._passphrase)))
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+
+        with open(self.path, "rb") as fp:
+            token = fp.read()[self.salt_size:]
+        try:
+            return json.loads(self._fernet.decrypt(token).decode())
+        except InvalidToken:
+            raise ValueError("Wrong passphrase for the session store %r" % self.path)
+
+    def _write(self, sessions):
+        token = self._fernet.encrypt(json.dumps(sessions).encode())
+
+        # write then rename so a crash can't leave a truncated store behind
+        temp = self.path + ".tmp"
+        fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(self._salt + token)
+        os.replace(temp, self.path)
+
+    def load(self, username):
+        """
+        The saved cookies of username, or None if there are none or all
+        of them have expired.
+        """
+        with self._lock:
+            cookies = self._read().get(username.lower())
+
+        if not cookies:
+            return None
+
+        now = time.time()
+        if all("expiry" in cookie and cookie["expiry"] <= now for cookie in cookies):
+            return None
+        return cookies
+
+    def save(self, username, cookies):
+        """
+        Save the cookies (as returned by driver.get_cookies()) of username.
+        """
+        with self._lock:
+            sessions = self._read()
+            sessions[username.lower()] = cookies
+            self._write(sessions)
+
+    def discard(self, username):
+        with self._lock:
+            sessions = self._read()
+            if sessions.pop(username.lower(), None) is not None:
+                self._write(sessions)
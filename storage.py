@@ -0,0 +1,281 @@
+"""
+SQLite backed stores which let the API answer lookups locally instead
+of going back to the site.
+"""
+import sqlite3
+import threading
+
+import forum
+from parsers import Member
+
+
+class UidIndex(object):
+    """
+    Durable username -> UID index. Usernames are case-insensitive on the
+    site so they're keyed in lowercase, which also keeps them in the
+    memberlist's order and lets prefix lookups run off the primary key.
+    """
+
+    def __init__(self, path="v3rmillion.db"):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS uids ("
+                "name TEXT PRIMARY KEY, username TEXT NOT NULL, uid TEXT NOT NULL"
+                ") WITHOUT ROWID"
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM uids").fetchone()[0]
+
+    def __contains__(self, username):
+        return self.get(username) is not None
+
+    def add(self, username, uid):
+        self.add_many([(username, uid)])
+
+    def add_many(self, users):
+        """
+        Record an iterable of (username, uid) pairs.
+        """
+        with self._lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO uids (name, username, uid) VALUES (?, ?, ?)",
+                ((username.lower(), username, str(uid)) for username, uid in users)
+            )
+
+    def get(self, username):
+        """
+        UID of a username, or None if it was never seen.
+        """
+        with self._lock:
+            row = self.db.execute("SELECT uid FROM uids WHERE name = ?", (username.lower(),)).fetchone()
+        return row[0] if row else None
+
+    def prefix(self, prefix, limit=None):
+        """
+        (username, uid) pairs of every known username starting with
+        prefix, in memberlist order.
+        """
+        prefix = prefix.lower()
+        query = "SELECT username, uid FROM uids WHERE name >= ? AND name < ? ORDER BY name"
+        if limit is not None:
+            query += " LIMIT %d" % limit
+
+        with self._lock:
+            return self.db.execute(query, (prefix, prefix + "\U0010ffff")).fetchall()
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+class MemberDirectory(UidIndex):
+    """
+    Local directory of the members crawled from the memberlist, along
+    with the crawl checkpoints so an interrupted crawl can resume. It's
+    a UidIndex too so it can be handed to API(uid_index=...).
+    """
+
+    def __init__(self, path="v3rmillion.db"):
+        super().__init__(path)
+
+        with self._lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS members ("
+                "uid TEXT PRIMARY KEY, username TEXT NOT NULL, name TEXT NOT NULL, "
+                "post_count INTEGER, joined TEXT"
+                ")"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS members_name ON members (name)")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS crawls (query TEXT PRIMARY KEY, page INTEGER NOT NULL)"
+            )
+
+    def add_members(self, members, query=None, page=None):
+        """
+        Record an iterable of parsers.Member, when a crawl query and page
+        are given the checkpoint is moved in the same transaction.
+        """
+        members = list(members)
+
+        with self._lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO members (uid, username, name, post_count, joined) VALUES (?, ?, ?, ?, ?)",
+                ((m.uid, m.username, m.username.lower(), m.post_count, m.joined) for m in members)
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO uids (name, username, uid) VALUES (?, ?, ?)",
+                ((m.username.lower(), m.username, m.uid) for m in members)
+            )
+            if query is not None:
+                self.db.execute("INSERT OR REPLACE INTO crawls (query, page) VALUES (?, ?)", (query, page))
+
+    def checkpoint(self, query):
+        """
+        Last memberlist page stored for a crawl query, 0 if none.
+        """
+        with self._lock:
+            row = self.db.execute("SELECT page FROM crawls WHERE query = ?", (query,)).fetchone()
+        return row[0] if row else 0
+
+    def reset(self, query):
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM crawls WHERE query = ?", (query,))
+
+    def member(self, uid):
+        with self._lock:
+            row = self.db.execute(
+                "SELECT uid, username, post_count, joined FROM members WHERE uid = ?", (str(uid),)
+            ).fetchone()
+        return Member(*row) if row else None
+
+    def lookup_many(self, usernames, chunk_size=500):
+        """
+        Map every known username of an iterable to its Member record,
+        keyed by the names as given (any case), unknown names are left out.
+        """
+        requested = {}
+        for username in usernames:
+            requested.setdefault(username.lower(), []).append(username)
+        names = list(requested)
+        found = {}
+
+        with self._lock:
+            for start in range(0, len(names), chunk_size):
+                chunk = names[start:start + chunk_size]
+                rows = self.db.execute(
+                    "SELECT uid, username, post_count, joined, name FROM members WHERE name IN (%s)"
+                    % ",".join("?" * len(chunk)), chunk
+                )
+                for row in rows:
+                    for username in requested[row[4]]:
+                        found[username] = Member(*row[:4])
+        return found
+
+    def members(self):
+        """
+        Iterate over every stored member in username order.
+        """
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT uid, username, post_count, joined FROM members ORDER BY name"
+            ).fetchall()
+        return (Member(*row) for row in rows)
+
+
+class PMStore(object):
+    """
+    Local copy of the PM folders, indexed by sender/title and by date so
+    lookups never have to walk the inbox on the site. Each folder keeps
+    the newest pmid synced so later syncs stop at the first known PM.
+    """
+
+    def __init__(self, path="v3rmillion.db"):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS pms ("
+                "pmid INTEGER PRIMARY KEY, fid INTEGER NOT NULL, title TEXT NOT NULL, "
+                "sender TEXT NOT NULL, sender_name TEXT NOT NULL, date TEXT, sent_at TEXT, message TEXT, "
+                "recipient TEXT"
+                ")"
+            )
+            columns = [row[1] for row in self.db.execute("PRAGMA table_info(pms)")]
+            if "recipient" not in columns:
+                # stores from before recipients were kept apart have them as senders
+                self.db.execute("ALTER TABLE pms ADD COLUMN recipient TEXT")
+                self.db.execute(
+                    "UPDATE pms SET recipient = sender, sender = '', sender_name = '' WHERE fid IN (%s)"
+                    % ",".join("?" * len(forum.recipient_fids)), forum.recipient_fids
+                )
+            self.db.execute("CREATE INDEX IF NOT EXISTS pms_sender ON pms (sender_name, title)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS pms_title ON pms (title)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS pms_sent_at ON pms (sent_at)")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS pm_folders ("
+                "fid INTEGER PRIMARY KEY, name TEXT NOT NULL, last_pmid INTEGER NOT NULL DEFAULT 0"
+                ")"
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM pms").fetchone()[0]
+
+    def last_pmid(self, fid):
+        with self._lock:
+            row = self.db.execute("SELECT last_pmid FROM pm_folders WHERE fid = ?", (fid,)).fetchone()
+        return row[0] if row else 0
+
+    def add(self, fid, folder_name, pms):
+        """
+        Store (pm, sent_at, message) triples of a folder, pm being a
+        parsers.PM, and move the folder's last_pmid past them. In the
+        sent items and drafts the listed name is stored as the recipient.
+        """
+        pms = list(pms)
+        last = max([pm.pmid for pm, _, _ in pms] + [self.last_pmid(fid)])
+        outgoing = fid in forum.recipient_fids
+
+        with self._lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO pms "
+                "(pmid, fid, title, sender, sender_name, recipient, date, sent_at, message) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (pm.pmid, fid, pm.title, "" if outgoing else pm.sender, "" if outgoing else pm.sender.lower(),
+                     pm.sender if outgoing else None, pm.date, sent_at.isoformat(" ") if sent_at else None, message)
+                    for pm, sent_at, message in pms
+                )
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO pm_folders (fid, name, last_pmid) VALUES (?, ?, ?)",
+                (fid, folder_name, last)
+            )
+
+    def set_message(self, pmid, message):
+        """
+        Store the body of a PM that was synced without it.
+        """
+        with self._lock, self.db:
+            self.db.execute("UPDATE pms SET message = ? WHERE pmid = ?", (message, pmid))
+
+    def find(self, sender=None, title=None, since=None, fid=None, limit=None):
+        """
+        Stored PMs as dicts, newest first, filtered by sender (any case),
+        exact title, a datetime they were sent after and folder.
+        """
+        clauses, params = [], []
+        for clause, value in (
+            ("sender_name = ?", sender.lower() if sender is not None else None),
+            ("title = ?", title),
+            ("sent_at > ?", since.isoformat(" ") if since is not None else None),
+            ("fid = ?", fid),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+
+        query = "SELECT pmid, fid, title, sender, recipient, date, sent_at, message FROM pms"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY pmid DESC"
+        if limit is not None:
+            query += " LIMIT %d" % limit
+
+        with self._lock:
+            rows = self.db.execute(query, params).fetchall()
+
+        columns = ("pmid", "fid", "title", "sender", "recipient", "date", "sent_at", "message")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self.db.close()
@@ -0,0 +1,74 @@
+"""
+Non-browser transport for the read-only calls of the API, pages are
+fetched over a pooled keep-alive session and parsed locally instead of
+being rendered by a webdriver.
+"""
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import forum
+from parsers import parse_document
+
+
+class HTTPTransport(object):
+    """
+    Keep-alive HTTP session which returns parsed pages, it reuses the
+    cookies of a logged in webdriver so it can read anything the
+    browser could.
+    """
+
+    user_agent = forum.user_agent
+
+    def __init__(self, timeout=6, pool_size=10, on_get=None):
+        """
+        on_get is called with the URL and the seconds taken after every
+        page fetched.
+        """
+        self.timeout = timeout
+        self.on_get = on_get
+        self.current_url = None
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = self.user_agent
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def load_cookies(self, cookies):
+        """
+        Copy cookies in the format returned by driver.get_cookies()
+        into the session.
+        """
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie["name"], cookie["value"],
+                domain=cookie.get("domain", ""), path=cookie.get("path", "/")
+            )
+
+    def clone(self):
+        """
+        A new transport with its own connection pool which shares
+        nothing but a copy of this one's cookies.
+        """
+        transport = HTTPTransport(self.timeout, on_get=self.on_get)
+        transport.session.cookies.update(self.session.cookies)
+        return transport
+
+    def get(self, url):
+        """
+        Fetch a page and return it as a parsed lxml tree.
+        """
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        finally:
+            if self.on_get is not None:
+                self.on_get(url, time.perf_counter() - start)
+        response.raise_for_status()
+        self.current_url = response.url
+        return parse_document(response.content, response.url)
+
+    def close(self):
+        self.session.close()
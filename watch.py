@@ -0,0 +1,134 @@
+"""
+Long-running watcher which delivers the new alerts and PMs of an
+account as they come in.
+"""
+import asyncio
+import threading
+from collections import OrderedDict
+
+
+class Watcher(object):
+    """
+    Polls an API with a single page load per tick (the header counters)
+    and only loads the alert listing or the inbox when a counter moves.
+    The interval drops back to min_interval after activity and backs off
+    towards max_interval while the account is idle.
+
+    New events are passed to the on_alert/on_pm callbacks, or yielded as
+    ("alert", alert) and ("pm", pm) tuples with `async for`.
+    """
+
+    min_interval = 5
+    max_interval = 300
+    backoff = 1.5
+    seen_limit = 1000  # alerts/PMs remembered for deduplication
+
+    def __init__(self, api, on_alert=None, on_pm=None, min_interval=None, max_interval=None,
+                 backoff=None, on_error=None):
+        self.api = api
+        self.on_alert = on_alert
+        self.on_pm = on_pm
+        self.on_error = on_error
+
+        if min_interval is not None:
+            self.min_interval = min_interval
+        if max_interval is not None:
+            self.max_interval = max_interval
+        if backoff is not None:
+            self.backoff = backoff
+
+        self.interval = self.min_interval
+        self._counts = None
+        self._seen_alerts = OrderedDict()
+        self._seen_pms = OrderedDict()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _unseen(self, seen, key):
+        if key in seen:
+            return False
+        seen[key] = True
+        if len(seen) > self.seen_limit:
+            seen.popitem(last=False)
+        return True
+
+    def poll(self):
+        """
+        Run a single tick and return the new events, the first tick only
+        records the alerts and PMs that are already there.
+        """
+        counts = self.api.pm_alert_count_read(max_age=0)
+        first = self._counts is None
+        last = self._counts or counts
+        self._counts = counts
+        events = []
+
+        if first or counts["alerts"] and counts["alerts"] != last["alerts"]:
+            for alert in self.api.latest_n_alerts_read(self.api.max_alert_listing):
+                key = alert["id"] or (alert["username"], alert["action"], alert["time"])
+                if self._unseen(self._seen_alerts, key) and not first:
+                    events.append(("alert", alert))
+
+        if first or counts["pms"] and counts["pms"] != last["pms"]:
+            for pm in self.api.pm_list_read():
+                if self._unseen(self._seen_pms, pm["link"]) and not first:
+                    events.append(("pm", pm))
+
+        if events:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        return events
+
+    def _deliver(self, events):
+        for kind, event in events:
+            callback = self.on_alert if kind == "alert" else self.on_pm
+            if callback is not None:
+                callback(event)
+
+    def _tick(self):
+        try:
+            return self.poll()
+        except Exception as exc:
+            if self.on_error is None:
+                raise
+            self.on_error(exc)
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+            return []
+
+    def run(self):
+        """
+        Poll and deliver events to the callbacks until stop() is called.
+        """
+        self._stop.clear()
+        while not self._stop.is_set():
+            self._deliver(self._tick())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """
+        Run the watcher in a daemon thread.
+        """
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+            self._thread = None
+
+    async def events(self):
+        """
+        Async generator of the new events, the blocking polls run in a
+        worker thread so the event loop is free in between.
+        """
+        self._stop.clear()
+        while not self._stop.is_set():
+            for event in await asyncio.to_thread(self._tick):
+                yield event
+            await asyncio.sleep(self.interval)
+
+    def __aiter__(self):
+        return self.events()
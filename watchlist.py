@@ -0,0 +1,261 @@
+"""
+Watchlist which keeps a set of profiles fresh within a request budget,
+refreshing the members whose profiles actually move more often and
+reporting what changed field by field.
+"""
+import heapq
+import threading
+import time
+from datetime import datetime
+
+
+class WatchedProfile(object):
+    """
+    Scheduling state of a watched UID, snapshot is the last records.Profile
+    read (None until the first refresh).
+    """
+
+    __slots__ = ("uid", "snapshot", "interval", "next_at", "refreshed_at", "refreshes", "changes")
+
+    def __init__(self, uid, interval, next_at):
+        self.uid = uid
+        self.snapshot = None
+        self.interval = interval
+        self.next_at = next_at
+        self.refreshed_at = None
+        self.refreshes = 0
+        self.changes = 0
+
+    def __repr__(self):
+        return "<WatchedProfile %d every %ds, %d/%d changed>" % (
+            self.uid, self.interval, self.changes, self.refreshes
+        )
+
+
+class Watchlist(object):
+    """
+    Refreshes watched profiles one page load at a time, at most
+    requests_per_minute of them (bursts of up to burst). Each UID has its
+    own interval which halves when a refresh finds a change and grows by
+    backoff when it doesn't, and is capped by how active the member is:
+    online members are refreshed every online_interval at the latest,
+    others no later than they've been idle since their last visit. The
+    most overdue UID goes first when the budget runs short.
+
+    Changes to the tracked fields are passed to on_change(uid, changes,
+    profile) with changes a {field: (old, new)} dict, the first refresh
+    of a UID only records its snapshot.
+    """
+
+    requests_per_minute = 30
+    burst = 5
+    min_interval = 60
+    online_interval = 300
+    initial_interval = 3600
+    max_interval = 7 * 86400
+    backoff = 1.5
+    # status only feeds the schedule, presence changes aren't reported
+    fields = ("username", "reputation", "post_count", "thread_count", "signature", "members_referred")
+
+    def __init__(self, api, uids=(), on_change=None, on_error=None, requests_per_minute=None, fields=None,
+                 clock=time.monotonic):
+        self.api = api
+        self.on_change = on_change
+        self.on_error = on_error
+        self.clock = clock
+
+        if requests_per_minute is not None:
+            self.requests_per_minute = requests_per_minute
+        if fields is not None:
+            self.fields = tuple(fields)
+
+        self._entries = {}
+        self._queue = []  # (next_at, uid), stale items are skipped when popped
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._filled_at = clock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        for uid in uids:
+            self.add(uid)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, uid):
+        return int(uid) in self._entries
+
+    def add(self, uid, snapshot=None):
+        """
+        Watch a UID, due right away unless a previous snapshot (a
+        records.Profile) is given to diff the next refresh against.
+        """
+        uid = int(uid)
+        with self._lock:
+            if uid in self._entries:
+                return self._entries[uid]
+            now = self.clock()
+            entry = WatchedProfile(uid, self.initial_interval, now)
+            if snapshot is not None:
+                entry.snapshot = snapshot
+                entry.interval = self._cap(entry.interval, snapshot)
+                entry.next_at = now + entry.interval
+            self._entries[uid] = entry
+            heapq.heappush(self._queue, (entry.next_at, uid))
+        return entry
+
+    def remove(self, uid):
+        with self._lock:
+            self._entries.pop(int(uid), None)
+
+    def get(self, uid):
+        """
+        The WatchedProfile of a UID, None if it isn't watched.
+        """
+        return self._entries.get(int(uid))
+
+    def snapshot(self, uid):
+        entry = self.get(uid)
+        return entry.snapshot if entry is not None else None
+
+    def _cap(self, interval, profile):
+        if profile.status == "Online":
+            cap = self.online_interval
+        elif profile.last_visit is not None:
+            idle = (datetime.now() - profile.last_visit).total_seconds()
+            cap = max(self.online_interval, idle)
+        else:
+            cap = self.max_interval
+        return max(self.min_interval, min(interval, cap, self.max_interval))
+
+    def _budget_wait(self):
+        """
+        Take a request from the budget, or return the number of seconds
+        until one is available.
+        """
+        now = self.clock()
+        rate = self.requests_per_minute / 60.0
+        self._tokens = min(self.burst, self._tokens + (now - self._filled_at) * rate)
+        self._filled_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / rate
+
+    def _next_due(self):
+        """
+        The entry at the head of the queue and how long until it's due,
+        (None, None) if nothing is watched.
+        """
+        with self._lock:
+            while self._queue:
+                next_at, uid = self._queue[0]
+                entry = self._entries.get(uid)
+                if entry is None or entry.next_at != next_at:
+                    heapq.heappop(self._queue)
+                    continue
+                return entry, next_at - self.clock()
+        return None, None
+
+    def _diff(self, old, new):
+        return {
+            field: (getattr(old, field), getattr(new, field))
+            for field in self.fields if getattr(old, field) != getattr(new, field)
+        }
+
+    def refresh(self, uid):
+        """
+        Refresh a UID now (outside the budget) and reschedule it, returns
+        the changes found.
+        """
+        entry = self.get(uid)
+        if entry is None:
+            raise LookupError("UID %s isn't on the watchlist." % uid)
+
+        if self.api.profile_cache is not None:
+            self.api.profile_cache.invalidate(uid=entry.uid)
+        try:
+            profile = self.api.profile_record_read(uid=entry.uid)
+        except Exception:
+            self._schedule(entry, min(entry.interval * self.backoff, self.max_interval))
+            raise
+
+        changes = self._diff(entry.snapshot, profile) if entry.snapshot is not None else {}
+        entry.refreshes += 1
+        entry.refreshed_at = time.time()
+        if changes:
+            entry.changes += 1
+            interval = entry.interval / 2
+        elif entry.snapshot is not None:
+            interval = entry.interval * self.backoff
+        else:
+            interval = entry.interval
+        entry.snapshot = profile
+        self._schedule(entry, self._cap(interval, profile))
+
+        if changes and self.on_change is not None:
+            self.on_change(entry.uid, changes, profile)
+        return changes
+
+    def _schedule(self, entry, interval):
+        with self._lock:
+            entry.interval = interval
+            entry.next_at = self.clock() + interval
+            if entry.uid in self._entries:
+                heapq.heappush(self._queue, (entry.next_at, entry.uid))
+
+    def refresh_next(self, block=True):
+        """
+        Refresh the most overdue UID once it's due and the budget allows,
+        returns (uid, changes), or None if nothing is watched, or nothing
+        can be refreshed yet and block is False (or stop() was called).
+        """
+        while not self._stop.is_set():
+            entry, due_in = self._next_due()
+            if entry is None:
+                return None
+            if due_in > 0:
+                if not block:
+                    return None
+                self._stop.wait(due_in)
+                continue
+
+            wait = self._budget_wait()
+            if wait:
+                if not block:
+                    return None
+                self._stop.wait(wait)
+                continue
+
+            try:
+                return entry.uid, self.refresh(entry.uid)
+            except Exception as exc:
+                if self.on_error is None:
+                    raise
+                self.on_error(exc)
+                return entry.uid, {}
+        return None
+
+    def run(self):
+        """
+        Keep refreshing until stop() is called.
+        """
+        self._stop.clear()
+        while not self._stop.is_set():
+            if self.refresh_next() is None:
+                self._stop.wait(self.min_interval)
+
+    def start(self):
+        """
+        Run the watchlist in a daemon thread.
+        """
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+            self._thread = None